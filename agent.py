@@ -1,21 +1,143 @@
 from dotenv import load_dotenv
 from livekit import agents, rtc
-from livekit.agents import AgentServer, AgentSession, Agent, room_io
+from livekit.agents import AgentServer, AgentSession, Agent, RunContext, room_io, metrics, function_tool
 from livekit.plugins import openai, noise_cancellation
-from prompts import INSTRUCTIONS, WELCOME_MESSAGE
+from prompt_builder import shared_prefix, welcome_instructions, token_report
+from db_driver import ConversationDB
+from storage import open_storage
+from db_writer import MessageWriter
+from costs import SessionCost, DEFAULT_MODEL
+from publisher import DataPublisher, publisher_metrics
+from latency import LATENCY, SessionLatency
+from knowledge_base import KnowledgeBase
+from answer_cache import AnswerCache, ANSWER_CACHE_TTL
+from retention import RetentionEngine, RetentionWorker
+from recorder import AGENT_RECORDING, RECORDING_SAMPLE_RATE, SessionRecorder, recording_path
+from api import AssistantFnc
+from datetime import datetime, timedelta
 import json
 import asyncio
+import logging
+import os
+import time
 
 load_dotenv()
 
+logger = logging.getLogger("agent")
+
+NUM_IDLE_PROCESSES = int(os.getenv("NUM_IDLE_PROCESSES", "3"))
+
 class Assistant(Agent):
-    def __init__(self) -> None:
-        super().__init__(instructions=INSTRUCTIONS)
+    def __init__(self, kb: KnowledgeBase, cache: AnswerCache, tools=None, on_partial_transcript=None,
+                 on_audio_frame=None) -> None:
+        super().__init__(instructions=shared_prefix(), tools=tools or [])
+        self._kb = kb
+        self._cache = cache
+        self._on_partial_transcript = on_partial_transcript
+        self._on_audio_frame = on_audio_frame
+        # The caller's latest committed question, until the reply to it
+        self.last_question = None
+
+    @function_tool()
+    async def lookup_product_info(self, context: RunContext, question: str) -> str:
+        """Look up Simple Invoice Manager documentation relevant to a customer question.
+
+        Args:
+            question: The customer's question, or the product topic to look up.
+        """
+        # The realtime model turns and replies on its own, so the tool call is
+        # where a verified answer to a frequent question can be handed over.
+        # The caller's words may not be committed yet; the model's phrasing
+        # is tried too.
+        for text in (self.last_question, question):
+            hit = self._cache.lookup(text) if text else None
+            if hit:
+                answer, score = hit
+                return (f"This question has been answered before (match {score:.2f}). Unless the user "
+                        f"is asking something different, reply with this answer in your own words: {answer}")
+        start = time.perf_counter()
+        snippets = self._kb.snippets(question)
+        LATENCY.observe("kb_lookup", (time.perf_counter() - start) * 1000)
+        return snippets
+
+    async def transcription_node(self, text, model_settings):
+        # Forward the reply text as it is generated, before the turn commits
+        spoken = []
+        async for delta in Agent.default.transcription_node(self, text, model_settings):
+            spoken.append(delta)
+            if self._on_partial_transcript:
+                self._on_partial_transcript("".join(spoken))
+            yield delta
+
+    async def realtime_audio_output_node(self, audio, model_settings):
+        # Copy the model's speech to the call recorder on its way to the room
+        async for frame in Agent.default.realtime_audio_output_node(self, audio, model_settings):
+            if self._on_audio_frame:
+                self._on_audio_frame(frame)
+            yield frame
+
+def prewarm(proc: agents.JobProcess):
+    """Per-process setup run before any job is assigned to the worker"""
+    start = time.perf_counter()
+    db = open_storage()
+    proc.userdata["db"] = db
+    proc.userdata["writer"] = MessageWriter(db)
+    proc.userdata["noise_cancellation"] = {
+        "sip": noise_cancellation.BVCTelephony(),
+        "default": noise_cancellation.BVC(),
+    }
+    proc.userdata["kb"] = KnowledgeBase.open()
+    cache = AnswerCache()
+    since = (datetime.now() - timedelta(seconds=ANSWER_CACHE_TTL)).isoformat()
+    cache.warm(db.get_question_answer_pairs(since))
+    proc.userdata["answer_cache"] = cache
+    LATENCY.register("answer_cache", cache.metrics)
+    LATENCY.register("message_writer", proc.userdata["writer"].metrics)
+    LATENCY.register("publisher", publisher_metrics)
+    # Retention is SQLite-only; shared servers run their own maintenance
+    proc.userdata["retention"] = None
+    if isinstance(db, ConversationDB):
+        retention = RetentionEngine(db)
+        proc.userdata["retention"] = RetentionWorker(retention)
+        LATENCY.register("retention", retention.metrics)
+    # Builds and caches the shared instruction prefix for this process
+    proc.userdata["prompt_tokens"] = token_report()
+    proc.userdata["latency"] = {"cold": [], "warm": []}
+    proc.userdata["prewarm_ms"] = (time.perf_counter() - start) * 1000
+
+
+def report_latency(proc: agents.JobProcess, kind: str, startup_ms: float, first_audio_ms: float):
+    """Log this job's startup/first-audio latency next to the process averages"""
+    samples = proc.userdata["latency"][kind]
+    samples.append((startup_ms, first_audio_ms))
+    LATENCY.observe(f"job_startup_{kind}", startup_ms)
+    LATENCY.observe(f"job_first_audio_{kind}", first_audio_ms)
+    summary = []
+    for name, rows in proc.userdata["latency"].items():
+        if rows:
+            avg_start = sum(r[0] for r in rows) / len(rows)
+            avg_audio = sum(r[1] for r in rows) / len(rows)
+            summary.append(f"{name}: n={len(rows)} startup={avg_start:.0f}ms first_audio={avg_audio:.0f}ms")
+    logger.info(
+        "%s job: startup %.0fms, first audio %.0fms (prewarm %.0fms) | %s",
+        kind, startup_ms, first_audio_ms, proc.userdata["prewarm_ms"], "; ".join(summary),
+    )
 
-server = AgentServer()
+
+server = AgentServer(num_idle_processes=NUM_IDLE_PROCESSES)
+server.setup_fnc = prewarm
 
 @server.rtc_session()
 async def my_agent(ctx: agents.JobContext):
+    job_start = time.perf_counter()
+    # Jobs that land on a process that skipped prewarm pay for it here
+    warm = "db" in ctx.proc.userdata
+    if not warm:
+        prewarm(ctx.proc)
+    db = ctx.proc.userdata["db"]
+    writer = ctx.proc.userdata["writer"]
+    filters = ctx.proc.userdata["noise_cancellation"]
+
     session = AgentSession(
         llm=openai.realtime.RealtimeModel(
             voice="shimmer",
@@ -23,57 +145,195 @@ async def my_agent(ctx: agents.JobContext):
         )
     )
 
-    # Track for transcripts
-    async def send_transcript(speaker: str, text: str):
-        data = json.dumps({
-            "type": "transcript",
-            "speaker": speaker,
-            "text": text
-        })
+    # Persist transcripts through the shared write-behind queue. The
+    # conversation row is created when the caller joins, so warm rooms that
+    # expire unclaimed leave nothing behind.
+    writer.start()
+    conversation_id = None
+    cost = SessionCost(DEFAULT_MODEL)
+    turns = SessionLatency()
+    await LATENCY.serve()
+    if ctx.proc.userdata["retention"]:
+        ctx.proc.userdata["retention"].start()
+
+    async def close_conversation():
+        if conversation_id is None:
+            return
+        await writer.flush()
+        await asyncio.to_thread(db.end_conversation, conversation_id, cost.total, turns.summary())
+
+    ctx.add_shutdown_callback(close_conversation)
+
+    # Customer-data tools; they need the caller's identity once they join
+    fnc = AssistantFnc(db, None)
+
+    # Server-side recording for callers the browser client does not record
+    recorder = None
+
+    async def record_caller(participant):
+        stream = rtc.AudioStream.from_participant(
+            participant=participant,
+            track_source=rtc.TrackSource.SOURCE_MICROPHONE,
+            sample_rate=RECORDING_SAMPLE_RATE,
+            num_channels=1,
+        )
+        try:
+            async for event in stream:
+                recorder.push("user", event.frame.data, event.frame.sample_rate, event.frame.num_channels)
+        finally:
+            await stream.aclose()
+
+    async def start_recording(participant):
+        nonlocal recorder
+        is_sip = participant.kind == rtc.ParticipantKind.PARTICIPANT_KIND_SIP
+        if AGENT_RECORDING == "off" or (AGENT_RECORDING == "sip" and not is_sip):
+            return
+        path = recording_path(ctx.room.name, conversation_id)
+        try:
+            recorder = SessionRecorder(path).start()
+        except (RuntimeError, OSError):
+            logger.warning("agent recording unavailable", exc_info=True)
+            return
+        caller_task = asyncio.create_task(record_caller(participant))
+
+        async def stop_recording():
+            caller_task.cancel()
+            await asyncio.to_thread(recorder.close)
+            logger.info("recording %s: %s", path, recorder.metrics())
+
+        ctx.add_shutdown_callback(stop_recording)
+        await asyncio.to_thread(db.set_agent_recording, conversation_id, str(path))
+
+    def on_assistant_audio(frame):
+        if recorder is not None:
+            recorder.push("assistant", frame.data, frame.sample_rate, frame.num_channels)
+
+    async def identify_participant():
+        nonlocal conversation_id, joined_at
+        participant = await ctx.wait_for_participant()
+        joined_at = time.perf_counter()
+        conversation_id = await asyncio.to_thread(
+            db.create_conversation, ctx.room.name, participant.identity, participant.name
+        )
+        fnc.conversation_id = conversation_id
+        fnc.participant_identity = participant.identity
+        fnc.invalidate()
+        asyncio.create_task(start_recording(participant))
+
+    identified = asyncio.create_task(identify_participant())
+
+    # One publisher task per room batches transcript and cost frames
+    publisher = DataPublisher(ctx.room).start()
+    ctx.add_shutdown_callback(publisher.aclose)
+
+    # The browser announces which wire encodings it can decode
+    @ctx.room.on("data_received")
+    def on_data(packet: rtc.DataPacket):
         try:
-            await ctx.room.local_participant.publish_data(data.encode(), reliable=True)
-        except:
-            pass
-
-    # Listen for agent speech
-    @session.on("agent_speech_committed")
-    def on_agent_speech(msg):
-        asyncio.create_task(send_transcript("Assistant", msg.content if hasattr(msg, 'content') else str(msg)))
-
-    # Listen for user speech  
-    @session.on("user_speech_committed")
-    def on_user_speech(msg):
-        asyncio.create_task(send_transcript("You", msg.content if hasattr(msg, 'content') else str(msg)))
-
-    # Send cost updates
-    async def cost_tracker():
-        await asyncio.sleep(2)
-        while True:
-            try:
-                cost_data = json.dumps({
-                    "type": "cost",
-                    "total": 0.0050  # Placeholder - update with real cost tracking
-                })
-                await ctx.room.local_participant.publish_data(cost_data.encode(), reliable=True)
-                await asyncio.sleep(10)
-            except:
-                break
-
-    asyncio.create_task(cost_tracker())
+            hello = json.loads(packet.data)
+        except ValueError:
+            return
+        if not isinstance(hello, dict) or hello.get("type") != "hello":
+            return
+        encodings = hello.get("wire")
+        if isinstance(encodings, list) and "binary" in encodings:
+            publisher.encoding = "binary"
+
+    # Question/answer pairs feed the per-process answer cache
+    answer_cache = ctx.proc.userdata["answer_cache"]
+    assistant = Assistant(
+        ctx.proc.userdata["kb"],
+        answer_cache,
+        tools=fnc.tools(),
+        on_partial_transcript=lambda text: publisher.send(
+            {"type": "partial", "speaker": "Assistant", "text": text}
+        ),
+        on_audio_frame=on_assistant_audio,
+    )
+
+    # Committed turns from both sides arrive as chat items
+    @session.on("conversation_item_added")
+    def on_conversation_item(ev):
+        role = getattr(ev.item, "role", None)
+        text = getattr(ev.item, "text_content", None)
+        if role not in ("user", "assistant") or not text:
+            return
+        writer.submit(conversation_id, role, text)
+        if role == "user":
+            assistant.last_question = text
+            return
+        # The answer cache is shared by every caller, so once this caller's
+        # own data is in the conversation nothing more is learned from it
+        if assistant.last_question and not fnc.calls:
+            answer_cache.observe(assistant.last_question, text)
+        assistant.last_question = None
+        # Closes the reply's partial bubble in the browser
+        publisher.send({"type": "transcript", "speaker": "Assistant", "text": text})
+
+    # Stream interim user transcription; the final one closes the bubble
+    @session.on("user_input_transcribed")
+    def on_user_transcribed(ev):
+        frame_type = "transcript" if ev.is_final else "partial"
+        publisher.send({"type": frame_type, "speaker": "You", "text": ev.transcript})
+
+    # Send cost updates only when the running total moves past the threshold
+    @session.on("metrics_collected")
+    def on_metrics(ev):
+        if not isinstance(ev.metrics, metrics.RealtimeModelMetrics):
+            return
+        if ev.metrics.ttft > 0:
+            turns.observe("llm_first_token", ev.metrics.ttft * 1000)
+        cost.add_usage(ev.metrics)
+        if cost.should_publish():
+            cost.mark_published()
+            publisher.send({"type": "cost", **cost.snapshot()})
+
+    # Per-turn spans: end of user speech -> first assistant audio
+    @session.on("user_state_changed")
+    def on_user_state(ev):
+        if ev.old_state == "speaking" and ev.new_state != "speaking":
+            turns.mark("user_speech_end")
+
+    # Time to first assistant audio, split by cold/warm process; measured
+    # from the caller joining when the room was pre-created
+    startup_ms = 0.0
+    joined_at = job_start
+    first_audio_reported = False
+
+    @session.on("agent_state_changed")
+    def on_agent_state(ev):
+        nonlocal first_audio_reported
+        if ev.new_state != "speaking":
+            # Played-out replies are already behind the recorder's clock; an
+            # interrupted one still has queued audio nobody heard
+            if ev.old_state == "speaking" and recorder is not None:
+                recorder.interrupt("assistant")
+            return
+        turns.since("user_speech_end", "user_to_first_audio")
+        turns.since("welcome", "welcome_first_audio")
+        if not first_audio_reported:
+            first_audio_reported = True
+            first_audio_ms = (time.perf_counter() - max(job_start, joined_at)) * 1000
+            report_latency(ctx.proc, "warm" if warm else "cold", startup_ms, first_audio_ms)
 
     await session.start(
         room=ctx.room,
-        agent=Assistant(),
+        agent=assistant,
         room_options=room_io.RoomOptions(
             audio_input=room_io.AudioInputOptions(
-                noise_cancellation=lambda params: noise_cancellation.BVCTelephony() 
+                noise_cancellation=lambda params: filters["sip"]
                 if params.participant.kind == rtc.ParticipantKind.PARTICIPANT_KIND_SIP 
-                else noise_cancellation.BVC(),
+                else filters["default"],
             ),
         ),
     )
+    startup_ms = (time.perf_counter() - job_start) * 1000
 
-    await session.generate_reply(instructions=WELCOME_MESSAGE)
+    # Rooms pre-created by token_service.py get their agent before anyone
+    # joins; hold the greeting until the caller is there to hear it.
+    await identified
+    turns.mark("welcome")
+    await session.generate_reply(instructions=welcome_instructions())
 
 if __name__ == "__main__":
     agents.cli.run_app(server)
\ No newline at end of file
@@ -0,0 +1,99 @@
+# answer_cache.py
+import os
+import re
+import time
+from collections import OrderedDict
+
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "512"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", str(24 * 3600)))
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.75"))
+# A question must have been seen this many times before it is served.
+ANSWER_CACHE_MIN_SEEN = 2
+# Shorter utterances ("yes", "go on") depend on context and are never cached.
+MIN_QUESTION_WORDS = 3
+
+
+def normalize(text):
+    return " ".join(re.findall(r"[a-z0-9']+", text.lower()))
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def similarity(a, b):
+    """Jaccard similarity of two trigram sets"""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class AnswerCache:
+    """LRU + TTL cache of answers to frequently asked questions.
+
+    Questions are matched fuzzily on character trigrams so small wording or
+    transcription differences still hit.
+    """
+
+    def __init__(self, max_entries=ANSWER_CACHE_SIZE, ttl=ANSWER_CACHE_TTL,
+                 threshold=ANSWER_CACHE_THRESHOLD, min_seen=ANSWER_CACHE_MIN_SEEN):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self.min_seen = min_seen
+        # normalized question -> [answer, trigrams, stored_at, seen]
+        self._entries = OrderedDict()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expired": 0}
+
+    def observe(self, question, answer, now=None):
+        """Record an answered question; repeats refresh the answer and count"""
+        key = normalize(question)
+        if len(key.split()) < MIN_QUESTION_WORDS or not answer:
+            return
+        now = time.monotonic() if now is None else now
+        entry = self._entries.pop(key, None)
+        seen = entry[3] + 1 if entry else 1
+        self._entries[key] = [answer, trigrams(key), now, seen]
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def lookup(self, question, now=None):
+        """Best cached answer above the threshold, as (answer, score), or None"""
+        key = normalize(question)
+        if len(key.split()) < MIN_QUESTION_WORDS:
+            return None
+        now = time.monotonic() if now is None else now
+        grams = trigrams(key)
+
+        best_key, best_score = None, 0.0
+        for cached_key, (answer, cached_grams, stored_at, seen) in list(self._entries.items()):
+            if now - stored_at > self.ttl:
+                del self._entries[cached_key]
+                self._stats["expired"] += 1
+                continue
+            if seen < self.min_seen:
+                continue
+            score = 1.0 if cached_key == key else similarity(grams, cached_grams)
+            if score > best_score:
+                best_key, best_score = cached_key, score
+
+        if best_key is None or best_score < self.threshold:
+            self._stats["misses"] += 1
+            return None
+        self._entries.move_to_end(best_key)
+        self._stats["hits"] += 1
+        return self._entries[best_key][0], best_score
+
+    def warm(self, pairs):
+        """Seed from (question, answer) pairs, oldest first"""
+        for question, answer in pairs:
+            self.observe(question, answer)
+
+    def metrics(self):
+        stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["size"] = len(self._entries)
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
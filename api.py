@@ -1,15 +1,124 @@
-from livekit.agents import llm
-from typing import Annotated
-import enum
+from livekit.agents import llm, function_tool, RunContext
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import json
 import logging
-from db_driver import DatabaseDriver
+import os
+import time
+from db_driver import ConversationDB
+from latency import LATENCY
 
 
 logger = logging.getLogger("user-data")
 logger.setLevel(logging.INFO)
 
-DB = DatabaseDriver()
+TOOL_WORKERS = int(os.getenv("TOOL_WORKERS", "4"))
+TOOL_CACHE_TTL = float(os.getenv("TOOL_CACHE_TTL", "60"))
 
-class AssistantFnc(llm.FunctionContext):
-    def __init__(self):
-        super().__init__()
\ No newline at end of file
+# DB I/O for tool handlers runs here so it never blocks the event loop.
+EXECUTOR = ThreadPoolExecutor(max_workers=TOOL_WORKERS, thread_name_prefix="tools")
+
+
+class AssistantFnc:
+    """Customer-data tools for one session.
+
+    Results are memoized per session for TOOL_CACHE_TTL seconds; call
+    invalidate() when the underlying data changes. Every call is logged to
+    the tool_calls table with its latency, memo hits flagged as cached.
+    """
+
+    def __init__(self, db: ConversationDB, conversation_id: int, participant_identity: str = ""):
+        self.db = db
+        self.conversation_id = conversation_id
+        self.participant_identity = participant_identity
+        self._memo = {}
+        # Customer data has entered the conversation once this is non-zero
+        self.calls = 0
+
+    def tools(self):
+        return llm.find_function_tools(self)
+
+    def invalidate(self, tool_name=None):
+        if tool_name is None:
+            self._memo.clear()
+        else:
+            for key in [k for k in self._memo if k[0] == tool_name]:
+                del self._memo[key]
+
+    async def _call(self, tool_name, params, fn, *args):
+        self.calls += 1
+        loop = asyncio.get_running_loop()
+        key = (tool_name, self.participant_identity, json.dumps(params, sort_keys=True))
+        start = time.perf_counter()
+        memo = self._memo.get(key)
+        cached = memo is not None and time.monotonic() - memo[1] < TOOL_CACHE_TTL
+        success = True
+        if cached:
+            result = memo[0]
+        else:
+            try:
+                result = await loop.run_in_executor(EXECUTOR, fn, *args)
+                result = json.dumps(result, default=str)
+                self._memo[key] = (result, time.monotonic())
+            except Exception as e:
+                logger.exception("tool %s failed", tool_name)
+                success = False
+                result = f"Error: {e}"
+        duration_ms = (time.perf_counter() - start) * 1000
+        if not cached:
+            LATENCY.observe(f"tool_{tool_name}", duration_ms)
+
+        # The audit log must not fail a call the customer already has an answer to
+        try:
+            await loop.run_in_executor(
+                EXECUTOR, self.db.add_tool_call,
+                self.conversation_id, tool_name, params, result, success, duration_ms, cached,
+            )
+        except Exception:
+            logger.exception("could not log tool call %s", tool_name)
+        return result
+
+    @function_tool()
+    async def get_past_conversations(self, context: RunContext, limit: int = 5) -> str:
+        """Look up this customer's previous support conversations, most recent first.
+
+        Args:
+            limit: How many past conversations to return.
+        """
+        if not self.participant_identity:
+            return "The customer has not been identified yet."
+        limit = max(1, min(limit, 20))
+
+        def lookup():
+            return [
+                {key: conv[key] for key in ("start_time", "duration_seconds", "message_count", "status")}
+                for conv in self.db.get_recent_conversations(self.participant_identity, limit + 1)
+                if conv["id"] != self.conversation_id
+            ][:limit]
+
+        return await self._call("get_past_conversations", {"limit": limit}, lookup)
+
+    @function_tool()
+    async def get_invoice_status(self, context: RunContext, invoice_number: str) -> str:
+        """Look up the status, amount and payments of one of the customer's invoices.
+
+        Args:
+            invoice_number: The invoice number the customer gave.
+        """
+        if not self.participant_identity:
+            return "The customer has not been identified yet."
+        invoice_number = invoice_number.strip().upper()
+        return await self._call(
+            "get_invoice_status", {"invoice_number": invoice_number},
+            self.db.get_invoice, invoice_number, self.participant_identity,
+        )
+
+    @function_tool()
+    async def list_open_invoices(self, context: RunContext) -> str:
+        """List the customer's invoices that are not fully paid, soonest due first."""
+        if not self.participant_identity:
+            return "The customer has not been identified yet."
+        return await self._call(
+            "list_open_invoices", {},
+            self.db.get_open_invoices, self.participant_identity,
+        )
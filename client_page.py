@@ -0,0 +1,57 @@
+# client_page.py
+import json
+import os
+from functools import lru_cache
+from pathlib import Path
+
+import client_server
+
+TEMPLATE_PATH = Path(os.getenv("CLIENT_TEMPLATE", "templates/client.html"))
+LIVEKIT_CLIENT_VERSION = "2.5.8"
+LIVEKIT_CLIENT_FILE = f"livekit-client-{LIVEKIT_CLIENT_VERSION}.umd.min.js"
+LIVEKIT_CLIENT_CDN = (
+    f"https://cdn.jsdelivr.net/npm/livekit-client@{LIVEKIT_CLIENT_VERSION}/dist/livekit-client.umd.min.js"
+)
+# Base URL the browser uses to reach client_server, when it differs from
+# the address the server binds.
+CLIENT_PUBLIC_URL = os.getenv("CLIENT_PUBLIC_URL", "")
+
+# Stream recordings to client_server while the call runs instead of keeping
+# them in the tab until Download Audio.
+RECORDING_UPLOAD = os.getenv("RECORDING_UPLOAD", "1") == "1"
+
+CONFIG_MARKER = "__CLIENT_CONFIG__"
+LIBRARY_MARKER = "__LIVEKIT_CLIENT_SRC__"
+
+
+def client_library_src():
+    """Local copy of livekit-client when fetched (utils.fetch_client_lib) and
+    CLIENT_PUBLIC_URL says where browsers reach it, else the CDN"""
+    # The bound address is usually loopback, which only this machine can load
+    if not CLIENT_PUBLIC_URL or not (client_server.STATIC_DIR / LIVEKIT_CLIENT_FILE).is_file():
+        return LIVEKIT_CLIENT_CDN
+    return f"{CLIENT_PUBLIC_URL}/static/{LIVEKIT_CLIENT_FILE}"
+
+
+@lru_cache(maxsize=1)
+def recording_upload_url():
+    """Where the page uploads recording chunks, or "" to keep them in the browser"""
+    if not RECORDING_UPLOAD:
+        return ""
+    return f"{CLIENT_PUBLIC_URL or client_server.start()}/recordings"
+
+
+@lru_cache(maxsize=1)
+def compiled_template():
+    """(head, tail) around the config marker; read and resolved once per process"""
+    page = TEMPLATE_PATH.read_text().replace(LIBRARY_MARKER, client_library_src())
+    head, tail = page.split(CONFIG_MARKER)
+    return head, tail
+
+
+def render(url, token):
+    """The client page with only this session's URL and token injected"""
+    head, tail = compiled_template()
+    # "</" would end the inline <script> early
+    config = json.dumps({"url": url, "token": token, "recordingUrl": recording_upload_url()}).replace("</", "<\\/")
+    return head + config + tail
@@ -0,0 +1,269 @@
+# client_server.py
+"""
+Local HTTP endpoint for the browser client's static assets and recording uploads
+Runs in a daemon thread of the Streamlit process; start it with start().
+
+POST /recordings/<room>/<take>?token=T&seq=N[&final=1]
+                    append chunk N of a recording; chunks must arrive in order
+GET /recordings/<room>/<take>?token=T
+                    download a finished recording
+
+T is the caller's LiveKit join token; it must grant the room in the path.
+"""
+
+import json
+import logging
+import mimetypes
+import os
+import re
+import shutil
+import threading
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+from livekit import api
+
+from storage import open_storage
+
+logger = logging.getLogger("client-server")
+
+STATIC_DIR = Path(os.getenv("STATIC_DIR", "static"))
+CLIENT_SERVER_HOST = os.getenv("CLIENT_SERVER_HOST", "127.0.0.1")
+CLIENT_SERVER_PORT = int(os.getenv("CLIENT_SERVER_PORT", "8502"))
+# Asset names carry their version, so they can be cached for a year.
+STATIC_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+RECORDINGS_DIR = Path(os.getenv("RECORDINGS_DIR", "recordings"))
+# MediaRecorder emits about a second of audio per chunk; anything far larger is refused
+RECORDING_CHUNK_LIMIT = int(os.getenv("RECORDING_CHUNK_LIMIT", str(4 * 1024 * 1024)))
+RECORDING_PATH = re.compile(r"^/recordings/([A-Za-z0-9_-]{1,128})/([0-9]{1,20})$")
+
+
+@lru_cache(maxsize=1)
+def token_verifier():
+    # LIVEKIT_API_KEY / LIVEKIT_API_SECRET, read on first use
+    return api.TokenVerifier()
+
+
+def token_grants_room(token, room):
+    """Whether `token` is a valid, unexpired LiveKit join token for `room`"""
+    try:
+        claims = token_verifier().verify(token)
+    except Exception:
+        return False
+    return bool(claims.video and claims.video.room_join and claims.video.room == room)
+
+
+class RecordingClosed(Exception):
+    pass
+
+
+class RecordingGap(Exception):
+    def __init__(self, expected):
+        super().__init__(f"expected chunk {expected}")
+        self.expected = expected
+
+
+class RecordingStore:
+    """Appends uploaded chunks to one file per recording, strictly in order.
+
+    Chunks go to a .part file that is renamed once the final chunk arrives;
+    a finished recording is never written again. A chunk re-sent after a
+    lost acknowledgement is acknowledged again without being written twice;
+    a gap is refused with the expected number. Each file is linked to its
+    conversation row (by room name) as soon as the agent has created it.
+    """
+
+    def __init__(self, directory=RECORDINGS_DIR, db=None):
+        self.directory = Path(directory)
+        self._db = db
+        self._lock = threading.Lock()
+        # name -> [lock, next sequence number, linked]
+        self._recordings = {}
+
+    @property
+    def db(self):
+        # Opened on the first upload, so serving static files never touches the database
+        with self._lock:
+            if self._db is None:
+                self._db = open_storage()
+            return self._db
+
+    def path(self, room, take):
+        """The finished recording"""
+        return self.directory / f"{room}-{take}.webm"
+
+    def append(self, room, take, seq, data, final=False):
+        """Write chunk `seq`; returns the next expected sequence number"""
+        path = self.path(room, take)
+        part = path.with_name(path.name + ".part")
+        with self._lock:
+            state = self._recordings.get(path.name)
+            if state is None:
+                # New recording, or one resumed after a restart of this process;
+                # a resumed file already holds chunk 0 at least
+                start = max(seq, 1) if part.exists() else 0
+                state = self._recordings[path.name] = [threading.Lock(), start, False]
+        with state[0]:
+            if path.exists():
+                with self._lock:
+                    self._recordings.pop(path.name, None)
+                # Only a repeated final marker (its acknowledgement was lost) is accepted
+                if final and not data:
+                    return seq + 1
+                raise RecordingClosed(path.name)
+            if seq > state[1]:
+                raise RecordingGap(state[1])
+            if seq == state[1]:
+                if data or seq == 0:
+                    self.directory.mkdir(parents=True, exist_ok=True)
+                    with open(part, "ab" if seq else "xb") as f:
+                        f.write(data)
+                state[1] = seq + 1
+            if final:
+                os.replace(part, path)
+                state[2] = self._link(room, path)
+                with self._lock:
+                    self._recordings.pop(path.name, None)
+            elif not state[2]:
+                state[2] = self._link(room, part)
+            return state[1]
+
+    def _link(self, room, path):
+        try:
+            return self.db.set_recording(room, str(path)) is not None
+        except Exception:
+            logger.warning("failed to link recording %s", path, exc_info=True)
+            return False
+
+
+class ClientHandler(BaseHTTPRequestHandler):
+    static_dir = STATIC_DIR
+    recordings = RecordingStore()
+
+    def log_message(self, format, *args):
+        # Request lines carry join tokens
+        args = tuple(re.sub(r"token=[^&\s]+", "token=-", a) if isinstance(a, str) else a for a in args)
+        logger.debug(format, *args)
+
+    def end_headers(self):
+        # The page lives in a sandboxed srcdoc iframe with an opaque origin
+        self.send_header("Access-Control-Allow-Origin", "*")
+        super().end_headers()
+
+    def send_json(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        match = RECORDING_PATH.match(url.path)
+        if not match:
+            self.send_error(404)
+            return
+        query = parse_qs(url.query)
+        if not token_grants_room(query.get("token", [""])[0], match.group(1)):
+            self.send_error(403)
+            return
+        try:
+            seq = int(query["seq"][0])
+            length = int(self.headers.get("Content-Length", "0"))
+        except (KeyError, ValueError):
+            self.send_error(400)
+            return
+        if length > RECORDING_CHUNK_LIMIT:
+            self.send_error(413)
+            return
+
+        data = self.rfile.read(length)
+        try:
+            next_seq = self.recordings.append(*match.groups(), seq, data, final=query.get("final") == ["1"])
+        except RecordingGap as e:
+            self.send_json(409, {"expected": e.expected})
+            return
+        except RecordingClosed:
+            self.send_json(410, {"error": "recording already finished"})
+            return
+        self.send_json(200, {"next": next_seq})
+
+    def send_recording(self, room, take):
+        path = self.recordings.path(room, take)
+        if not path.is_file():
+            self.send_error(404)
+            return
+        with open(path, "rb") as f:
+            self.send_response(200)
+            self.send_header("Content-Type", "audio/webm")
+            self.send_header("Content-Length", str(os.fstat(f.fileno()).st_size))
+            self.send_header("Content-Disposition", f'attachment; filename="{path.name}"')
+            self.send_header("Cache-Control", "no-store")
+            self.end_headers()
+            shutil.copyfileobj(f, self.wfile)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        match = RECORDING_PATH.match(url.path)
+        if match:
+            if not token_grants_room(parse_qs(url.query).get("token", [""])[0], match.group(1)):
+                self.send_error(403)
+                return
+            self.send_recording(*match.groups())
+            return
+        if not self.path.startswith("/static/"):
+            self.send_error(404)
+            return
+        name = self.path[len("/static/"):].split("?", 1)[0]
+        path = (self.static_dir / name).resolve()
+        if self.static_dir.resolve() not in path.parents or not path.is_file():
+            self.send_error(404)
+            return
+
+        stat = path.stat()
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", STATIC_CACHE_CONTROL)
+            self.end_headers()
+            return
+
+        body = path.read_bytes()
+        self.send_response(200)
+        self.send_header("Content-Type", mimetypes.guess_type(name)[0] or "application/octet-stream")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", STATIC_CACHE_CONTROL)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class ClientHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 drops connections when many tabs load at once
+    request_queue_size = 128
+
+
+_server = None
+_lock = threading.Lock()
+
+
+def start(host=CLIENT_SERVER_HOST, port=CLIENT_SERVER_PORT):
+    """Start the server once per process and return its base URL"""
+    global _server
+    with _lock:
+        if _server is None:
+            try:
+                _server = ClientHTTPServer((host, port), ClientHandler)
+            except OSError:
+                # Another Streamlit process on this host already serves it
+                logger.info("client server port %d in use, reusing it", port)
+                return f"http://{host}:{port}"
+            threading.Thread(target=_server.serve_forever, name="client-server", daemon=True).start()
+            logger.info("client assets on http://%s:%d/static/", host, port)
+        return f"http://{host}:{port}"
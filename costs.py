@@ -0,0 +1,92 @@
+# costs.py
+import logging
+import os
+
+logger = logging.getLogger("costs")
+
+# USD per 1M tokens for the realtime models we run.
+PRICING = {
+    "gpt-realtime": {
+        "audio_input": 32.00,
+        "audio_input_cached": 0.40,
+        "audio_output": 64.00,
+        "text_input": 4.00,
+        "text_input_cached": 0.40,
+        "text_output": 16.00,
+    },
+    "gpt-4o-realtime-preview": {
+        "audio_input": 40.00,
+        "audio_input_cached": 2.50,
+        "audio_output": 80.00,
+        "text_input": 5.00,
+        "text_input_cached": 2.50,
+        "text_output": 20.00,
+    },
+}
+# Only selects the price row; set it to the model the realtime plugin runs
+# (the plugin's default is gpt-realtime)
+DEFAULT_MODEL = os.getenv("REALTIME_MODEL", "gpt-realtime")
+
+# The realtime API bills audio as tokens: roughly one token per 100ms of
+# user audio and one per 50ms of assistant audio.
+AUDIO_INPUT_TOKENS_PER_SECOND = 10
+AUDIO_OUTPUT_TOKENS_PER_SECOND = 20
+
+COST_PUBLISH_THRESHOLD = float(os.getenv("COST_PUBLISH_THRESHOLD", "0.001"))
+
+
+class SessionCost:
+    """Running cost of one session, fed from realtime model usage metrics."""
+
+    def __init__(self, model=DEFAULT_MODEL, publish_threshold=COST_PUBLISH_THRESHOLD):
+        self.prices = PRICING.get(model)
+        if self.prices is None:
+            logger.warning("No pricing for realtime model %r; costing it as gpt-realtime", model)
+            self.prices = PRICING["gpt-realtime"]
+        self.publish_threshold = publish_threshold
+        self.usage = {name: 0 for name in self.prices}
+        self.total = 0.0
+        self._published = None
+
+    def add_usage(self, metrics):
+        """Accumulate a RealtimeModelMetrics event; returns the new total"""
+        input_details = getattr(metrics, "input_token_details", None)
+        output_details = getattr(metrics, "output_token_details", None)
+        cached_details = getattr(input_details, "cached_tokens_details", None)
+
+        audio_in = getattr(input_details, "audio_tokens", 0) or 0
+        text_in = getattr(input_details, "text_tokens", 0) or 0
+        cached_audio = getattr(cached_details, "audio_tokens", 0) or 0
+        cached_text = getattr(cached_details, "text_tokens", 0) or 0
+
+        usage = {
+            "audio_input": max(audio_in - cached_audio, 0),
+            "audio_input_cached": cached_audio,
+            "text_input": max(text_in - cached_text, 0),
+            "text_input_cached": cached_text,
+            "audio_output": getattr(output_details, "audio_tokens", 0) or 0,
+            "text_output": getattr(output_details, "text_tokens", 0) or 0,
+        }
+        for name, tokens in usage.items():
+            self.usage[name] += tokens
+            self.total += tokens * self.prices[name] / 1_000_000
+        return self.total
+
+    def should_publish(self):
+        """True when the total moved by at least the threshold since the last publish"""
+        if self._published is None:
+            return self.total > 0
+        return abs(self.total - self._published) >= self.publish_threshold
+
+    def mark_published(self):
+        self._published = self.total
+
+    def snapshot(self):
+        audio_in = self.usage["audio_input"] + self.usage["audio_input_cached"]
+        return {
+            "total": round(self.total, 6),
+            "audio_input_seconds": round(audio_in / AUDIO_INPUT_TOKENS_PER_SECOND, 1),
+            "audio_output_seconds": round(self.usage["audio_output"] / AUDIO_OUTPUT_TOKENS_PER_SECOND, 1),
+            "text_tokens": (self.usage["text_input"] + self.usage["text_input_cached"]
+                            + self.usage["text_output"]),
+        }
@@ -1,15 +1,261 @@
 # db_driver.py
+import os
+import queue
 import sqlite3
+import threading
 import json
 from datetime import datetime
 from pathlib import Path
 from contextlib import contextmanager
 
 DB_PATH = Path("conversations.db")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+DB_SYNCHRONOUS = os.getenv("DB_SYNCHRONOUS", "NORMAL")
+DB_STATEMENT_CACHE = 256
+DB_DAILY_ROLLUPS = os.getenv("DB_DAILY_ROLLUPS", "1") == "1"
+
+# Schema migrations applied in order on startup; the applied version is kept
+# in PRAGMA user_version. Append new entries, never edit released ones.
+MIGRATIONS = [
+    # 1: secondary indexes for the session, participant and transcript read paths
+    [
+        "CREATE INDEX IF NOT EXISTS idx_messages_conversation_time ON messages(conversation_id, timestamp)",
+        "CREATE INDEX IF NOT EXISTS idx_conversations_session ON conversations(session_id, start_time)",
+        "CREATE INDEX IF NOT EXISTS idx_conversations_participant ON conversations(participant_identity, start_time)",
+        "CREATE INDEX IF NOT EXISTS idx_conversations_start ON conversations(start_time)",
+    ],
+    # 2: per-session latency span summary (JSON)
+    [
+        "ALTER TABLE conversations ADD COLUMN latency_summary TEXT",
+    ],
+    # 3: tool call log and the local invoice store behind the assistant tools
+    [
+        """CREATE TABLE IF NOT EXISTS tool_calls (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            conversation_id INTEGER,
+            timestamp TEXT NOT NULL,
+            tool_name TEXT NOT NULL,
+            parameters TEXT,
+            result TEXT,
+            success INTEGER NOT NULL DEFAULT 1,
+            duration_ms REAL,
+            FOREIGN KEY (conversation_id) REFERENCES conversations(id)
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_tool_calls_conversation ON tool_calls(conversation_id, timestamp)",
+        """CREATE TABLE IF NOT EXISTS invoices (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            invoice_number TEXT NOT NULL UNIQUE,
+            participant_identity TEXT NOT NULL,
+            amount REAL NOT NULL,
+            currency TEXT NOT NULL DEFAULT 'USD',
+            amount_paid REAL NOT NULL DEFAULT 0.0,
+            status TEXT NOT NULL DEFAULT 'unpaid',
+            issue_date TEXT,
+            due_date TEXT,
+            updated_at TEXT
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_invoices_participant ON invoices(participant_identity, status)",
+    ],
+    # 4: per-day totals maintained by end_conversation
+    [
+        """CREATE TABLE IF NOT EXISTS daily_rollups (
+            day TEXT PRIMARY KEY,
+            conversations INTEGER NOT NULL DEFAULT 0,
+            messages INTEGER NOT NULL DEFAULT 0,
+            duration_seconds INTEGER NOT NULL DEFAULT 0,
+            cost REAL NOT NULL DEFAULT 0.0
+        )""",
+    ],
+    # 5: full-text index over message content, kept in sync by triggers
+    [
+        """CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+            content, content='messages', content_rowid='id', tokenize='porter unicode61'
+        )""",
+        """CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+            INSERT INTO messages_fts (rowid, content) VALUES (new.id, new.content);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN
+            INSERT INTO messages_fts (messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS messages_fts_update AFTER UPDATE OF content ON messages BEGIN
+            INSERT INTO messages_fts (messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+            INSERT INTO messages_fts (rowid, content) VALUES (new.id, new.content);
+        END""",
+        "INSERT INTO messages_fts (messages_fts) VALUES ('rebuild')",
+    ],
+    # 6: audio recording uploaded by the browser client
+    [
+        "ALTER TABLE conversations ADD COLUMN recording_path TEXT",
+    ],
+    # 7: mixed recording made by the agent itself (recorder.py)
+    [
+        "ALTER TABLE conversations ADD COLUMN agent_recording_path TEXT",
+    ],
+    # 8: recent messages across conversations, read to warm the answer cache
+    [
+        "CREATE INDEX IF NOT EXISTS idx_messages_time ON messages(timestamp)",
+    ],
+    # 9: tool calls answered from the per-session memo
+    [
+        "ALTER TABLE tool_calls ADD COLUMN cached INTEGER NOT NULL DEFAULT 0",
+    ],
+]
+
+# Hot read paths that must be served from an index, with sample parameters
+# for EXPLAIN QUERY PLAN.
+HOT_QUERIES = {
+    "transcript_by_conversation": ("""
+        SELECT id, timestamp, role, content FROM messages
+        WHERE conversation_id = ? ORDER BY timestamp, id
+    """, (1,)),
+    "conversations_by_session": ("""
+        SELECT * FROM conversations
+        WHERE session_id = ? ORDER BY start_time
+    """, ("session",)),
+    "history_by_session": ("""
+        SELECT c.session_id, c.start_time AS conversation_start, m.* FROM conversations c
+        JOIN messages m ON m.conversation_id = c.id
+        WHERE c.session_id = ? ORDER BY c.start_time, c.id, m.timestamp, m.id
+    """, ("session",)),
+    "history_by_start_time": ("""
+        SELECT c.session_id, c.start_time AS conversation_start, m.* FROM conversations c
+        JOIN messages m ON m.conversation_id = c.id
+        WHERE c.start_time >= ? AND c.start_time < ? ORDER BY c.start_time, c.id, m.timestamp, m.id
+    """, ("2026-01-01", "2026-02-01")),
+    "recent_by_participant": ("""
+        SELECT * FROM conversations
+        WHERE participant_identity = ? ORDER BY start_time DESC LIMIT ?
+    """, ("participant", 10)),
+    "tool_calls_by_session": ("""
+        SELECT c.session_id, c.start_time AS conversation_start, t.* FROM conversations c
+        JOIN tool_calls t ON t.conversation_id = c.id
+        WHERE c.session_id = ? ORDER BY c.start_time, c.id, t.timestamp, t.id
+    """, ("session",)),
+    "tool_calls_by_start_time": ("""
+        SELECT c.session_id, c.start_time AS conversation_start, t.* FROM conversations c
+        JOIN tool_calls t ON t.conversation_id = c.id
+        WHERE c.start_time >= ? AND c.start_time < ? ORDER BY c.start_time, c.id, t.timestamp, t.id
+    """, ("2026-01-01", "2026-02-01")),
+    "tool_calls_by_conversation": ("""
+        SELECT * FROM tool_calls
+        WHERE conversation_id = ? ORDER BY timestamp, id
+    """, (1,)),
+    "question_answer_pairs": ("""
+        SELECT q.content AS question, a.content AS answer FROM messages q
+        JOIN messages a ON a.id = (
+            SELECT n.id FROM messages n
+            WHERE n.conversation_id = q.conversation_id AND (n.timestamp, n.id) > (q.timestamp, q.id)
+            ORDER BY n.timestamp, n.id LIMIT 1
+        )
+        WHERE q.timestamp >= ? AND q.role = 'user' AND a.role = 'assistant'
+          AND NOT EXISTS (
+              SELECT 1 FROM tool_calls t
+              WHERE t.conversation_id = q.conversation_id AND t.timestamp <= a.timestamp
+          )
+        ORDER BY q.timestamp DESC, q.id DESC
+        LIMIT ?
+    """, ("2026-01-01", 5000)),
+    "sessions_page": ("""
+        SELECT c.session_id, c.start_time FROM conversations c
+        WHERE c.start_time <= ? AND (c.start_time, c.session_id) < (?, ?)
+          AND NOT EXISTS (
+              SELECT 1 FROM conversations e
+              WHERE e.session_id = c.session_id AND (e.start_time, e.id) < (c.start_time, c.id)
+          )
+        ORDER BY c.start_time DESC, c.session_id DESC
+        LIMIT ?
+    """, ("2026-02-01", "2026-02-01", "", 50)),
+    "invoices_by_participant": ("""
+        SELECT * FROM invoices
+        WHERE participant_identity = ? AND status != 'paid' ORDER BY due_date
+    """, ("participant",)),
+}
+
+
+def fts_query(text):
+    """Quote each word so free text is never parsed as FTS5 syntax"""
+    return " ".join('"' + word.replace('"', '""') + '"' for word in text.split())
+
+
+def _tool_call(row):
+    return dict(row, parameters=json.loads(row['parameters'] or "{}"))
+
+
+class ConnectionPool:
+    """Bounded pool of long-lived SQLite connections in WAL mode.
+
+    A pool size of 0 disables pooling and opens a connection per call,
+    which is how the driver used to behave.
+    """
+
+    def __init__(self, db_path, size=DB_POOL_SIZE, synchronous=DB_SYNCHRONOUS, timeout=30.0):
+        self.db_path = db_path
+        self.size = size
+        self.synchronous = synchronous
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._opened = 0
+        self._closed = False
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.timeout,
+            check_same_thread=False,
+            cached_statements=DB_STATEMENT_CACHE,
+        )
+        conn.row_factory = sqlite3.Row
+        # Only takes effect on a new file, so it must come before WAL mode
+        # writes the header; older files are converted by enable_incremental_vacuum.
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA synchronous={self.synchronous}")
+        conn.execute("PRAGMA foreign_keys=ON")
+        return conn
+
+    def acquire(self):
+        if self._closed:
+            raise RuntimeError("connection pool is closed")
+        if self.size <= 0:
+            return self._connect()
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._opened < self.size:
+                self._opened += 1
+                try:
+                    return self._connect()
+                except Exception:
+                    self._opened -= 1
+                    raise
+        # Every connection is checked out; wait for one to come back.
+        return self._idle.get(timeout=self.timeout)
+
+    def release(self, conn):
+        if self.size <= 0 or self._closed:
+            conn.close()
+            return
+        self._idle.put(conn)
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+        with self._lock:
+            self._opened = 0
+
 
 class ConversationDB:
-    def __init__(self, db_path=DB_PATH):
+    def __init__(self, db_path=DB_PATH, pool_size=DB_POOL_SIZE, daily_rollups=DB_DAILY_ROLLUPS):
         self.db_path = db_path
+        self.daily_rollups = daily_rollups
+        self.pool = ConnectionPool(db_path, size=pool_size)
         self._init_db()
     
     def _init_db(self):
@@ -40,16 +286,59 @@ class ConversationDB:
                     FOREIGN KEY (conversation_id) REFERENCES conversations(id)
                 )
             """)
+        self._migrate()
+
+    def _migrate(self):
+        conn = self.pool.acquire()
+        try:
+            # BEGIN IMMEDIATE so concurrent workers starting up apply each
+            # migration exactly once.
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                version = conn.execute("PRAGMA user_version").fetchone()[0]
+                for number, statements in enumerate(MIGRATIONS[version:], start=version + 1):
+                    for statement in statements:
+                        conn.execute(statement)
+                    conn.execute(f"PRAGMA user_version = {number}")
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        finally:
+            self.pool.release(conn)
+
+    def schema_version(self):
+        with self._get_conn() as conn:
+            return conn.execute("PRAGMA user_version").fetchone()[0]
+
+    def explain(self, sql, params=()):
+        """Return the EXPLAIN QUERY PLAN detail lines for a query"""
+        with self._get_conn() as conn:
+            return [row['detail'] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+
+    def full_table_scans(self, queries=None):
+        """List (query name, plan detail) pairs for hot queries that scan a whole table or index"""
+        scans = []
+        for name, (sql, params) in (queries or HOT_QUERIES).items():
+            for detail in self.explain(sql, params):
+                if detail.startswith("SCAN "):
+                    scans.append((name, detail))
+        return scans
     
     @contextmanager
     def _get_conn(self):
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
+        conn = self.pool.acquire()
         try:
             yield conn
             conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
         finally:
-            conn.close()
+            self.pool.release(conn)
+
+    def close(self):
+        self.pool.close()
     
     def create_conversation(self, session_id, participant_identity="", participant_name=""):
         with self._get_conn() as conn:
@@ -59,6 +348,31 @@ class ConversationDB:
             """, (session_id, datetime.now().isoformat(), participant_identity, participant_name))
             return cursor.lastrowid
     
+    def set_participant(self, conversation_id, participant_identity, participant_name=""):
+        with self._get_conn() as conn:
+            conn.execute("""
+                UPDATE conversations 
+                SET participant_identity = ?, participant_name = ?
+                WHERE id = ?
+            """, (participant_identity, participant_name, conversation_id))
+    
+    def set_recording(self, session_id, recording_path):
+        """Attach a recording file to the session's latest conversation; returns its id or None"""
+        with self._get_conn() as conn:
+            row = conn.execute("""
+                SELECT id FROM conversations WHERE session_id = ? ORDER BY start_time DESC, id DESC LIMIT 1
+            """, (session_id,)).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE conversations SET recording_path = ? WHERE id = ?", (recording_path, row['id']))
+            return row['id']
+
+    def set_agent_recording(self, conversation_id, recording_path):
+        with self._get_conn() as conn:
+            conn.execute("""
+                UPDATE conversations SET agent_recording_path = ? WHERE id = ?
+            """, (recording_path, conversation_id))
+
     def add_message(self, conversation_id, role, content):
         with self._get_conn() as conn:
             conn.execute("""
@@ -71,11 +385,33 @@ class ConversationDB:
                 SET message_count = message_count + 1
                 WHERE id = ?
             """, (conversation_id,))
+
+    def add_messages(self, rows):
+        """Insert many (conversation_id, role, content, timestamp) rows in one transaction"""
+        rows = list(rows)
+        if not rows:
+            return
+        counts = {}
+        for conversation_id, _, _, _ in rows:
+            counts[conversation_id] = counts.get(conversation_id, 0) + 1
+        with self._get_conn() as conn:
+            conn.executemany("""
+                INSERT INTO messages (conversation_id, role, content, timestamp)
+                VALUES (?, ?, ?, ?)
+            """, rows)
+
+            conn.executemany("""
+                UPDATE conversations 
+                SET message_count = message_count + ?
+                WHERE id = ?
+            """, [(count, conversation_id) for conversation_id, count in counts.items()])
     
-    def end_conversation(self, conversation_id, cost=0.0):
+    def end_conversation(self, conversation_id, cost=0.0, latency_summary=None):
+        # The transcript is assembled on read by iter_transcript, so closing
+        # a conversation no longer touches its messages.
         with self._get_conn() as conn:
             cursor = conn.execute("""
-                SELECT start_time FROM conversations WHERE id = ?
+                SELECT start_time, message_count, status FROM conversations WHERE id = ?
             """, (conversation_id,))
             row = cursor.fetchone()
             
@@ -83,25 +419,373 @@ class ConversationDB:
                 start = datetime.fromisoformat(row['start_time'])
                 duration = int((datetime.now() - start).total_seconds())
                 
-                cursor = conn.execute("""
-                    SELECT timestamp, role, content FROM messages 
-                    WHERE conversation_id = ? ORDER BY timestamp
-                """, (conversation_id,))
-                
-                transcript = "\n".join([
-                    f"[{msg['timestamp']}] {msg['role']}: {msg['content']}"
-                    for msg in cursor.fetchall()
-                ])
-                
                 conn.execute("""
                     UPDATE conversations 
-                    SET end_time = ?, duration_seconds = ?, transcript = ?, cost = ?, status = 'completed'
+                    SET end_time = ?, duration_seconds = ?, cost = ?, status = 'completed',
+                        latency_summary = ?
                     WHERE id = ?
-                """, (datetime.now().isoformat(), duration, transcript, cost, conversation_id))
+                """, (datetime.now().isoformat(), duration, cost,
+                      json.dumps(latency_summary) if latency_summary else None, conversation_id))
+
+                if self.daily_rollups and row['status'] != 'completed':
+                    conn.execute("""
+                        INSERT INTO daily_rollups (day, conversations, messages, duration_seconds, cost)
+                        VALUES (?, 1, ?, ?, ?)
+                        ON CONFLICT(day) DO UPDATE SET
+                            conversations = conversations + 1,
+                            messages = messages + excluded.messages,
+                            duration_seconds = duration_seconds + excluded.duration_seconds,
+                            cost = cost + excluded.cost
+                    """, (row['start_time'][:10], row['message_count'], duration, cost))
+
+    def rebuild_daily_rollups(self):
+        """Recompute daily_rollups from completed conversations.
+
+        Totals for conversations already removed by retention are lost.
+        """
+        with self._get_conn() as conn:
+            conn.execute("DELETE FROM daily_rollups")
+            conn.execute("""
+                INSERT INTO daily_rollups (day, conversations, messages, duration_seconds, cost)
+                SELECT substr(start_time, 1, 10), COUNT(*), SUM(message_count),
+                       SUM(duration_seconds), SUM(cost)
+                FROM conversations WHERE status = 'completed'
+                GROUP BY substr(start_time, 1, 10)
+            """)
+
+    def get_daily_stats(self, since="", until="9999"):
+        with self._get_conn() as conn:
+            cursor = conn.execute("""
+                SELECT * FROM daily_rollups WHERE day >= ? AND day < ? ORDER BY day
+            """, (since, until))
+            return [dict(row) for row in cursor]
+
+    def list_sessions(self, limit=50, cursor=None):
+        """One page of sessions, newest first, with per-session aggregates.
+
+        `cursor` is the (start_time, session_id) of the last row of the
+        previous page; returns (rows, next_cursor).
+        """
+        after = cursor or ("\uffff", "")
+        with self._get_conn() as conn:
+            # Seek to the page through each session's first conversation,
+            # then aggregate only the sessions on it
+            page = conn.execute(HOT_QUERIES["sessions_page"][0], (after[0], after[0], after[1], limit)).fetchall()
+            if not page:
+                return [], None
+            ids = [row['session_id'] for row in page]
+            marks = ", ".join("?" * len(ids))
+            totals = {row['session_id']: dict(row) for row in conn.execute(f"""
+                SELECT session_id,
+                       MAX(end_time) AS end_time,
+                       MAX(participant_identity) AS participant_identity,
+                       COUNT(*) AS conversations,
+                       SUM(message_count) AS messages,
+                       SUM(duration_seconds) AS duration_seconds,
+                       SUM(cost) AS cost,
+                       SUM(status = 'active') AS active
+                FROM conversations
+                WHERE session_id IN ({marks})
+                GROUP BY session_id
+            """, ids)}
+        rows = [dict(totals[row['session_id']], start_time=row['start_time']) for row in page]
+        next_cursor = (rows[-1]['start_time'], rows[-1]['session_id']) if len(rows) == limit else None
+        return rows, next_cursor
+
+    def iter_messages(self, conversation_id, chunk_size=500):
+        """Yield a conversation's messages in order without loading them all"""
+        with self._get_conn() as conn:
+            cursor = conn.execute(HOT_QUERIES["transcript_by_conversation"][0], (conversation_id,))
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                for msg in rows:
+                    yield dict(msg)
+
+    def iter_transcript(self, conversation_id, chunk_size=500):
+        """Yield formatted transcript lines without loading every message"""
+        for msg in self.iter_messages(conversation_id, chunk_size):
+            yield f"[{msg['timestamp']}] {msg['role']}: {msg['content']}"
+
+    def get_transcript(self, conversation_id):
+        """Full transcript text, falling back to the legacy stored column"""
+        transcript = "\n".join(self.iter_transcript(conversation_id))
+        if transcript:
+            return transcript
+        conv = self.get_conversation(conversation_id)
+        return (conv or {}).get('transcript') or ""
+    
+    def _iter_with_tool_calls(self, messages_query, calls_query, params, chunk_size=500):
+        """Merge two cursors ordered by (conversation start, conversation, timestamp).
+
+        Each message is yielded with the tool calls its conversation made
+        after it and before the next message, so cost does not grow with a
+        query per message. Calls made before their conversation's first
+        message, or in a conversation without messages, are yielded as an
+        entry of their own with role and content set to None.
+        """
+        def order(row):
+            return (row['conversation_start'], row['conversation_id'], row['timestamp'])
+
+        def rows(cursor):
+            while True:
+                chunk = cursor.fetchmany(chunk_size)
+                if not chunk:
+                    return
+                yield from chunk
+
+        def attach_calls(current, until):
+            """Attach calls ordered before `until` (all if None); yields the entries they complete"""
+            nonlocal call
+            while call is not None and (until is None or order(call) < order(until)):
+                if current is None or current['conversation_id'] != call['conversation_id']:
+                    if current is not None:
+                        yield current
+                    current = {key: call[key] for key in ('session_id', 'conversation_start', 'conversation_id')}
+                    current.update(id=None, timestamp=call['timestamp'], role=None, content=None, tool_calls=[])
+                current['tool_calls'].append(_tool_call(call))
+                call = next(calls, None)
+            return current
+
+        with self._get_conn() as conn:
+            calls = rows(conn.execute(calls_query, params))
+            call = next(calls, None)
+            current = None
+            for row in rows(conn.execute(messages_query, params)):
+                current = yield from attach_calls(current, row)
+                if current is not None:
+                    yield current
+                current = dict(row, tool_calls=[])
+            current = yield from attach_calls(current, None)
+            if current is not None:
+                yield current
+
+    def iter_session_messages(self, session_id, chunk_size=500):
+        """Yield a session's messages in order, each with its tool calls"""
+        return self._iter_with_tool_calls(
+            HOT_QUERIES["history_by_session"][0], HOT_QUERIES["tool_calls_by_session"][0],
+            (session_id,), chunk_size,
+        )
+
+    def iter_messages_between(self, start, end, chunk_size=500):
+        """Yield messages with tool calls for every conversation started in [start, end)"""
+        return self._iter_with_tool_calls(
+            HOT_QUERIES["history_by_start_time"][0], HOT_QUERIES["tool_calls_by_start_time"][0],
+            (start, end), chunk_size,
+        )
+
+    def get_session_messages(self, session_id):
+        return list(self.iter_session_messages(session_id))
+
+    def search_messages(self, query, participant_identity=None, since=None, until=None,
+                        limit=20, offset=0, raw=False):
+        """Full-text search over messages, best match first, with highlighted snippets.
+
+        `query` is treated as plain words unless `raw` is set, in which case it
+        is passed through as an FTS5 query expression.
+        """
+        match = query if raw else fts_query(query)
+        if not match:
+            return []
+        with self._get_conn() as conn:
+            cursor = conn.execute("""
+                SELECT m.id, m.conversation_id, m.timestamp, m.role,
+                       c.session_id, c.participant_identity,
+                       snippet(messages_fts, 0, '[', ']', '...', 12) AS snippet,
+                       bm25(messages_fts) AS rank
+                FROM messages_fts
+                JOIN messages m ON m.id = messages_fts.rowid
+                JOIN conversations c ON c.id = m.conversation_id
+                WHERE messages_fts MATCH ?
+                  AND (? IS NULL OR c.participant_identity = ?)
+                  AND (? IS NULL OR m.timestamp >= ?)
+                  AND (? IS NULL OR m.timestamp < ?)
+                ORDER BY rank
+                LIMIT ? OFFSET ?
+            """, (match, participant_identity, participant_identity, since, since,
+                  until, until, limit, offset))
+            return [dict(row) for row in cursor]
+
+    def get_question_answer_pairs(self, since, limit=5000):
+        """(user message, following assistant reply) pairs newer than `since`, oldest first.
+
+        Replies given after a customer-data tool ran in the conversation are
+        left out: they may repeat that customer's data.
+        """
+        with self._get_conn() as conn:
+            # Each recent user message looks up the next message of its own
+            # conversation, so only rows newer than `since` are read
+            cursor = conn.execute(HOT_QUERIES["question_answer_pairs"][0], (since, limit))
+            return [(row['question'], row['answer']) for row in reversed(cursor.fetchall())]
+    
+    def add_tool_call(self, conversation_id, tool_name, parameters, result, success=True, duration_ms=None,
+                      cached=False):
+        with self._get_conn() as conn:
+            cursor = conn.execute("""
+                INSERT INTO tool_calls (conversation_id, timestamp, tool_name, parameters, result, success,
+                                        duration_ms, cached)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, (conversation_id, datetime.now().isoformat(), tool_name, json.dumps(parameters),
+                  result, int(success), duration_ms, int(cached)))
+            return cursor.lastrowid
+
+    def get_tool_calls_for_conversation(self, conversation_id):
+        with self._get_conn() as conn:
+            cursor = conn.execute(HOT_QUERIES["tool_calls_by_conversation"][0], (conversation_id,))
+            return [_tool_call(row) for row in cursor]
+
+    def get_tool_usage_stats(self, session_id=None):
+        """Per-tool call counts, success and memo-hit counts, average latency of the
+        calls that ran, and share of all calls"""
+        with self._get_conn() as conn:
+            if session_id:
+                cursor = conn.execute("""
+                    SELECT t.tool_name, COUNT(*) AS calls, SUM(t.success) AS succeeded, SUM(t.cached) AS cached,
+                           AVG(CASE WHEN t.cached = 0 THEN t.duration_ms END) AS avg_ms,
+                           SUM(COUNT(*)) OVER () AS total
+                    FROM tool_calls t
+                    JOIN conversations c ON c.id = t.conversation_id
+                    WHERE c.session_id = ?
+                    GROUP BY t.tool_name
+                    ORDER BY calls DESC
+                """, (session_id,))
+            else:
+                cursor = conn.execute("""
+                    SELECT tool_name, COUNT(*) AS calls, SUM(success) AS succeeded, SUM(cached) AS cached,
+                           AVG(CASE WHEN cached = 0 THEN duration_ms END) AS avg_ms,
+                           SUM(COUNT(*)) OVER () AS total
+                    FROM tool_calls
+                    GROUP BY tool_name
+                    ORDER BY calls DESC
+                """)
+            return [dict(row) for row in cursor]
+
+    def get_recent_conversations(self, participant_identity, limit=10):
+        with self._get_conn() as conn:
+            cursor = conn.execute(HOT_QUERIES["recent_by_participant"][0], (participant_identity, limit))
+            return [dict(row) for row in cursor]
+
+    def get_invoice(self, invoice_number, participant_identity):
+        with self._get_conn() as conn:
+            cursor = conn.execute("""
+                SELECT * FROM invoices WHERE invoice_number = ? AND participant_identity = ?
+            """, (invoice_number, participant_identity))
+            row = cursor.fetchone()
+            return dict(row) if row else None
+
+    def get_open_invoices(self, participant_identity):
+        with self._get_conn() as conn:
+            cursor = conn.execute(HOT_QUERIES["invoices_by_participant"][0], (participant_identity,))
+            return [dict(row) for row in cursor]
+
+    def upsert_invoice(self, invoice_number, participant_identity, amount, currency="USD",
+                       amount_paid=0.0, status="unpaid", issue_date=None, due_date=None):
+        """Insert or refresh one invoice in the local store behind the assistant tools"""
+        with self._get_conn() as conn:
+            conn.execute("""
+                INSERT INTO invoices (invoice_number, participant_identity, amount, currency,
+                                      amount_paid, status, issue_date, due_date, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(invoice_number) DO UPDATE SET
+                    participant_identity = excluded.participant_identity,
+                    amount = excluded.amount,
+                    currency = excluded.currency,
+                    amount_paid = excluded.amount_paid,
+                    status = excluded.status,
+                    issue_date = excluded.issue_date,
+                    due_date = excluded.due_date,
+                    updated_at = excluded.updated_at
+            """, (invoice_number, participant_identity, amount, currency, amount_paid, status,
+                  issue_date, due_date, datetime.now().isoformat()))
     
     def get_conversation(self, conversation_id):
         with self._get_conn() as conn:
             cursor = conn.execute("""
                 SELECT * FROM conversations WHERE id = ?
             """, (conversation_id,))
-            return dict(cursor.fetchone()) if cursor.fetchone() else None
\ No newline at end of file
+            row = cursor.fetchone()
+            return dict(row) if row else None
+
+    def find_expired_conversations(self, before, statuses=("completed",), participant_identity=None,
+                                   limit=500, after=None):
+        """Conversations started before `before`, oldest first, in keyset pages.
+
+        `after` is the (start_time, id) of the last row of the previous page.
+        """
+        statuses = list(statuses)
+        after = after or ("", 0)
+        with self._get_conn() as conn:
+            cursor = conn.execute(f"""
+                SELECT * FROM conversations
+                WHERE start_time < ? AND (start_time, id) > (?, ?)
+                  AND status IN ({", ".join("?" * len(statuses))})
+                  AND (? IS NULL OR participant_identity = ?)
+                ORDER BY start_time, id
+                LIMIT ?
+            """, (before, after[0], after[1], *statuses, participant_identity, participant_identity, limit))
+            return [dict(row) for row in cursor]
+
+    def delete_conversations(self, conversation_ids):
+        """Delete conversations with their messages and tool calls in one transaction.
+
+        Daily rollups are kept, so historical totals survive retention.
+        """
+        ids = list(conversation_ids)
+        if not ids:
+            return 0
+        marks = ", ".join("?" * len(ids))
+        with self._get_conn() as conn:
+            conn.execute(f"DELETE FROM tool_calls WHERE conversation_id IN ({marks})", ids)
+            conn.execute(f"DELETE FROM messages WHERE conversation_id IN ({marks})", ids)
+            return conn.execute(f"DELETE FROM conversations WHERE id IN ({marks})", ids).rowcount
+
+    def delete_session_data(self, session_id):
+        """Delete every conversation in a session; returns how many were removed"""
+        with self._get_conn() as conn:
+            ids = [row['id'] for row in conn.execute(
+                HOT_QUERIES["conversations_by_session"][0], (session_id,))]
+        return self.delete_conversations(ids)
+
+    def compact_transcripts(self, limit=500):
+        """Clear up to `limit` legacy transcript columns, which duplicate the messages table"""
+        with self._get_conn() as conn:
+            return conn.execute("""
+                UPDATE conversations SET transcript = NULL
+                WHERE id IN (SELECT id FROM conversations WHERE transcript IS NOT NULL LIMIT ?)
+            """, (limit,)).rowcount
+
+    def file_size(self):
+        """Bytes in the main database file, excluding the WAL"""
+        return os.path.getsize(self.db_path) if os.path.exists(self.db_path) else 0
+
+    def incremental_vacuum_enabled(self):
+        with self._get_conn() as conn:
+            return conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+
+    def enable_incremental_vacuum(self):
+        """Switch an existing file to incremental auto-vacuum (rewrites the whole file once)"""
+        conn = self.pool.acquire()
+        try:
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute("VACUUM")
+        finally:
+            self.pool.release(conn)
+
+    def incremental_vacuum(self, pages=1000):
+        """Return up to `pages` free pages to the OS; returns how many were freed"""
+        with self._get_conn() as conn:
+            before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+                # executescript steps the pragma to completion; a single
+                # execute() frees only one page per step.
+                conn.executescript(f"PRAGMA incremental_vacuum({int(pages)});")
+            return before - conn.execute("PRAGMA freelist_count").fetchone()[0]
+
+    def optimize(self):
+        """Refresh planner statistics and checkpoint the WAL without blocking writers"""
+        with self._get_conn() as conn:
+            # Sampled ANALYZE: bounded cost however large the tables grow
+            conn.execute("PRAGMA analysis_limit=400")
+            conn.execute("ANALYZE")
+            conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchall()
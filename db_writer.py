@@ -0,0 +1,134 @@
+# db_writer.py
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+
+from db_driver import ConversationDB
+
+logger = logging.getLogger("db-writer")
+
+DB_BATCH_SIZE = int(os.getenv("DB_BATCH_SIZE", "100"))
+DB_FLUSH_INTERVAL = float(os.getenv("DB_FLUSH_INTERVAL", "0.5"))
+DB_MAX_PENDING = int(os.getenv("DB_MAX_PENDING", "10000"))
+
+
+class MessageWriter:
+    """Write-behind queue that batches transcript messages from every session.
+
+    Messages are queued on the event loop and written with executemany in a
+    worker thread once `max_batch` rows are pending or `flush_interval`
+    seconds have passed, whichever comes first.
+    """
+
+    def __init__(self, db: ConversationDB, max_batch=DB_BATCH_SIZE,
+                 flush_interval=DB_FLUSH_INTERVAL, max_pending=DB_MAX_PENDING):
+        self.db = db
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self._queue = asyncio.Queue(maxsize=max_pending)
+        self._write_lock = asyncio.Lock()
+        self._task = None
+        self._stats = {
+            "enqueued": 0,
+            "written": 0,
+            "dropped": 0,
+            "batches": 0,
+            "failed_batches": 0,
+            "last_flush_ms": 0.0,
+            "max_flush_ms": 0.0,
+            "total_flush_ms": 0.0,
+        }
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        return self
+
+    async def put(self, conversation_id, role, content):
+        """Queue a message, waiting for room when the queue is full"""
+        await self._queue.put(self._row(conversation_id, role, content))
+        self._stats["enqueued"] += 1
+
+    def submit(self, conversation_id, role, content):
+        """Queue a message from a sync callback; drops it if the queue is full"""
+        try:
+            self._queue.put_nowait(self._row(conversation_id, role, content))
+        except asyncio.QueueFull:
+            self._stats["dropped"] += 1
+            logger.warning("message queue full, dropping message for conversation %s", conversation_id)
+            return False
+        self._stats["enqueued"] += 1
+        return True
+
+    async def flush(self):
+        """Write everything queued so far and wait for in-flight batches"""
+        batch = self._drain(self._queue.qsize())
+        while batch:
+            await self._write(batch[:self.max_batch])
+            batch = batch[self.max_batch:]
+        await self._queue.join()
+
+    async def aclose(self):
+        await self.flush()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def metrics(self):
+        stats = dict(self._stats)
+        stats["queue_depth"] = self._queue.qsize()
+        stats["avg_flush_ms"] = stats["total_flush_ms"] / stats["batches"] if stats["batches"] else 0.0
+        return stats
+
+    @staticmethod
+    def _row(conversation_id, role, content):
+        return (conversation_id, role, content, datetime.now().isoformat())
+
+    def _drain(self, limit):
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append(self._queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.max_batch:
+                batch.extend(self._drain(self.max_batch - len(batch)))
+                remaining = deadline - loop.time()
+                if len(batch) >= self.max_batch or remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            await self._write(batch)
+
+    async def _write(self, batch):
+        async with self._write_lock:
+            start = time.perf_counter()
+            try:
+                await asyncio.to_thread(self.db.add_messages, batch)
+                self._stats["written"] += len(batch)
+            except Exception:
+                self._stats["failed_batches"] += 1
+                logger.exception("failed to write %d queued messages", len(batch))
+            finally:
+                elapsed = (time.perf_counter() - start) * 1000
+                self._stats["batches"] += 1
+                self._stats["last_flush_ms"] = elapsed
+                self._stats["total_flush_ms"] += elapsed
+                self._stats["max_flush_ms"] = max(self._stats["max_flush_ms"], elapsed)
+                for _ in batch:
+                    self._queue.task_done()
@@ -0,0 +1,161 @@
+# knowledge_base.py
+import heapq
+import json
+import math
+import mmap
+import os
+import re
+import struct
+from collections import Counter
+from pathlib import Path
+
+KB_DOCS_DIR = Path(os.getenv("KB_DOCS_DIR", "knowledge"))
+KB_INDEX_PATH = Path(os.getenv("KB_INDEX_PATH", "knowledge/index.kbx"))
+KB_TOP_K = int(os.getenv("KB_TOP_K", "3"))
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+MAGIC = b"KBX1"
+# One posting: chunk id (uint32), term frequency (uint16)
+POSTING = struct.Struct("<IH")
+
+STOPWORDS = frozenset("""
+    a an and are as at be by can do does for from how i in is it me my of on or
+    so that the this to what when where which who with you your
+""".split())
+
+
+def tokenize(text):
+    tokens = []
+    for token in re.findall(r"[a-z0-9]+", text.lower()):
+        if token in STOPWORDS:
+            continue
+        # Crude plural folding: "invoices" and "invoice" share postings.
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def load_chunks(docs_dir=KB_DOCS_DIR):
+    """Split every markdown doc into one chunk per '## ' section"""
+    chunks = []
+    for path in sorted(Path(docs_dir).glob("*.md")):
+        title, lines = None, []
+        for line in path.read_text().splitlines():
+            if line.startswith("## "):
+                if title and lines:
+                    chunks.append({"title": title, "text": " ".join(lines)})
+                title, lines = line[3:].strip(), []
+            elif title and line.strip():
+                lines.append(line.strip())
+        if title and lines:
+            chunks.append({"title": title, "text": " ".join(lines)})
+    return chunks
+
+
+def build_index(chunks, index_path=KB_INDEX_PATH):
+    """Write a BM25 index file: header JSON, packed postings, chunk texts"""
+    doc_lengths = []
+    postings = {}
+    for chunk_id, chunk in enumerate(chunks):
+        counts = Counter(tokenize(chunk["title"] + " " + chunk["text"]))
+        doc_lengths.append(sum(counts.values()))
+        for term, tf in counts.items():
+            postings.setdefault(term, []).append((chunk_id, min(tf, 0xFFFF)))
+
+    postings_blob = bytearray()
+    terms = {}
+    for term in sorted(postings):
+        terms[term] = [len(postings_blob), len(postings[term])]
+        for entry in postings[term]:
+            postings_blob += POSTING.pack(*entry)
+
+    texts_blob = bytearray()
+    spans = []
+    for chunk in chunks:
+        data = json.dumps(chunk).encode()
+        spans.append([len(texts_blob), len(data)])
+        texts_blob += data
+
+    header = json.dumps({
+        "terms": terms,
+        "doc_lengths": doc_lengths,
+        "avgdl": sum(doc_lengths) / len(doc_lengths) if doc_lengths else 0.0,
+        "chunks": spans,
+        "postings_size": len(postings_blob),
+    }).encode()
+
+    index_path = Path(index_path)
+    index_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = index_path.with_suffix(f".{os.getpid()}.tmp")
+    with open(tmp, "wb") as f:
+        f.write(MAGIC + struct.pack("<I", len(header)) + header)
+        f.write(postings_blob)
+        f.write(texts_blob)
+    os.replace(tmp, index_path)
+    return index_path
+
+
+class KnowledgeBase:
+    """Read-only BM25 index over product docs, memory-mapped from disk."""
+
+    def __init__(self, index_path=KB_INDEX_PATH):
+        self._file = open(index_path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:4] != MAGIC:
+            raise ValueError(f"{index_path} is not a knowledge base index")
+        (header_len,) = struct.unpack_from("<I", self._mm, 4)
+        header = json.loads(self._mm[8:8 + header_len])
+        self.terms = header["terms"]
+        self.doc_lengths = header["doc_lengths"]
+        self.avgdl = header["avgdl"] or 1.0
+        self.spans = header["chunks"]
+        self._postings_at = 8 + header_len
+        self._texts_at = self._postings_at + header["postings_size"]
+
+    @classmethod
+    def open(cls, docs_dir=KB_DOCS_DIR, index_path=KB_INDEX_PATH):
+        """Load the index, rebuilding it first if any doc is newer"""
+        index_path = Path(index_path)
+        docs = list(Path(docs_dir).glob("*.md"))
+        if not index_path.exists() or any(
+            doc.stat().st_mtime > index_path.stat().st_mtime for doc in docs
+        ):
+            build_index(load_chunks(docs_dir), index_path)
+        return cls(index_path)
+
+    def close(self):
+        self._mm.close()
+        self._file.close()
+
+    def chunk(self, chunk_id):
+        offset, length = self.spans[chunk_id]
+        start = self._texts_at + offset
+        return json.loads(self._mm[start:start + length])
+
+    def search(self, query, k=KB_TOP_K):
+        """Top-k chunks for a query as (score, chunk) pairs"""
+        n = len(self.doc_lengths)
+        scores = {}
+        for term in set(tokenize(query)):
+            entry = self.terms.get(term)
+            if entry is None:
+                continue
+            offset, count = entry
+            idf = math.log(1 + (n - count + 0.5) / (count + 0.5))
+            start = self._postings_at + offset
+            for chunk_id, tf in POSTING.iter_unpack(self._mm[start:start + count * POSTING.size]):
+                norm = K1 * (1 - B + B * self.doc_lengths[chunk_id] / self.avgdl)
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf * (K1 + 1) / (tf + norm)
+        best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [(score, self.chunk(chunk_id)) for chunk_id, score in best]
+
+    def snippets(self, query, k=KB_TOP_K):
+        """Top-k chunks formatted for injection into the model context"""
+        results = self.search(query, k)
+        if not results:
+            return "No matching product documentation found."
+        return "\n\n".join(f"{chunk['title']}: {chunk['text']}" for _, chunk in results)
@@ -0,0 +1,164 @@
+# latency.py
+import asyncio
+import bisect
+import logging
+import os
+import time
+
+logger = logging.getLogger("latency")
+
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9464"))
+# Each worker process binds the first free port in this range.
+METRICS_PORT_RANGE = 16
+
+# Upper bounds in milliseconds; the last bucket is +Inf.
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 300, 500, 750, 1000, 1500, 2000, 3000, 5000, 10000)
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def percentile(samples, q):
+    """Nearest-rank percentile of a list of samples"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class Histogram:
+    """Fixed-bucket latency histogram with constant memory."""
+
+    def __init__(self, buckets=BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, ms):
+        self.counts[bisect.bisect_left(self.buckets, ms)] += 1
+        self.count += 1
+        self.sum += ms
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th observation"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(self.buckets, self.counts):
+            seen += n
+            if seen >= rank:
+                return float(bound)
+        return float("inf")
+
+
+class LatencyRecorder:
+    """Process-wide span histograms, exposed in Prometheus text format."""
+
+    def __init__(self):
+        self.histograms = {}
+        self.collectors = {}
+        self._server = None
+        self.port = None
+
+    def observe(self, span, ms):
+        hist = self.histograms.get(span)
+        if hist is None:
+            hist = self.histograms[span] = Histogram()
+        hist.observe(ms)
+
+    def register(self, name, collector):
+        """Expose a component's metrics() dict as gauges on the endpoint"""
+        self.collectors[name] = collector
+
+    def snapshot(self):
+        return {
+            span: {"count": h.count, **{f"p{int(q * 100)}": h.quantile(q) for q in QUANTILES}}
+            for span, h in self.histograms.items()
+        }
+
+    def render(self):
+        lines = ["# TYPE voice_span_latency_ms histogram"]
+        for span, h in sorted(self.histograms.items()):
+            cumulative = 0
+            for bound, n in zip(h.buckets, h.counts):
+                cumulative += n
+                lines.append(f'voice_span_latency_ms_bucket{{span="{span}",le="{bound}"}} {cumulative}')
+            lines.append(f'voice_span_latency_ms_bucket{{span="{span}",le="+Inf"}} {h.count}')
+            lines.append(f'voice_span_latency_ms_sum{{span="{span}"}} {h.sum:.3f}')
+            lines.append(f'voice_span_latency_ms_count{{span="{span}"}} {h.count}')
+        lines.append("# TYPE voice_span_latency_quantile_ms gauge")
+        for span, h in sorted(self.histograms.items()):
+            for q in QUANTILES:
+                lines.append(f'voice_span_latency_quantile_ms{{span="{span}",quantile="{q}"}} {h.quantile(q)}')
+        for name, collector in sorted(self.collectors.items()):
+            lines.append(f"# TYPE voice_{name} gauge")
+            for stat, value in collector().items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    lines.append(f'voice_{name}{{stat="{stat}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    async def serve(self, port=METRICS_PORT):
+        """Start the local /metrics endpoint once per process"""
+        if self._server is not None:
+            return self.port
+        for candidate in range(port, port + METRICS_PORT_RANGE):
+            try:
+                self._server = await asyncio.start_server(self._handle, "127.0.0.1", candidate)
+            except OSError:
+                continue
+            self.port = candidate
+            logger.info("latency metrics on http://127.0.0.1:%d/metrics", candidate)
+            return candidate
+        logger.warning("no free metrics port in %d-%d", port, port + METRICS_PORT_RANGE - 1)
+        return None
+
+    async def _handle(self, reader, writer):
+        try:
+            await reader.readuntil(b"\r\n\r\n")
+            body = self.render().encode()
+            writer.write(
+                b"HTTP/1.0 200 OK\r\n"
+                b"Content-Type: text/plain; version=0.0.4\r\n"
+                + f"Content-Length: {len(body)}\r\n\r\n".encode()
+                + body
+            )
+            await writer.drain()
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+LATENCY = LatencyRecorder()
+
+
+class SessionLatency:
+    """Per-session turn spans, mirrored into the process recorder."""
+
+    def __init__(self, recorder=LATENCY):
+        self.recorder = recorder
+        self.samples = {}
+        self._marks = {}
+
+    def mark(self, name):
+        self._marks[name] = time.perf_counter()
+
+    def since(self, name, span):
+        """Record the time since mark `name` as `span` and clear the mark"""
+        start = self._marks.pop(name, None)
+        if start is not None:
+            self.observe(span, (time.perf_counter() - start) * 1000)
+
+    def observe(self, span, ms):
+        self.samples.setdefault(span, []).append(ms)
+        self.recorder.observe(span, ms)
+
+    def summary(self):
+        return {
+            span: {
+                "count": len(values),
+                **{f"p{int(q * 100)}": round(percentile(values, q), 1) for q in QUANTILES},
+                "max": round(max(values), 1),
+            }
+            for span, values in self.samples.items()
+        }
@@ -0,0 +1,369 @@
+# pg_driver.py
+import asyncio
+import json
+import threading
+from datetime import datetime
+
+from db_driver import DB_POOL_SIZE, DB_STATEMENT_CACHE, DB_DAILY_ROLLUPS, _tool_call
+
+try:
+    import asyncpg
+except ImportError:
+    asyncpg = None
+
+# Timestamps stay ISO-8601 TEXT so ordering and range filters behave
+# exactly as they do on SQLite.
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS conversations (
+        id BIGSERIAL PRIMARY KEY,
+        session_id TEXT NOT NULL,
+        start_time TEXT NOT NULL,
+        end_time TEXT,
+        participant_identity TEXT,
+        participant_name TEXT,
+        message_count INTEGER DEFAULT 0,
+        duration_seconds INTEGER DEFAULT 0,
+        transcript TEXT,
+        cost DOUBLE PRECISION DEFAULT 0.0,
+        status TEXT DEFAULT 'active',
+        latency_summary TEXT,
+        recording_path TEXT,
+        agent_recording_path TEXT
+    )""",
+    # Added after the first release; CREATE TABLE above skips existing tables
+    "ALTER TABLE conversations ADD COLUMN IF NOT EXISTS recording_path TEXT",
+    "ALTER TABLE conversations ADD COLUMN IF NOT EXISTS agent_recording_path TEXT",
+    """CREATE TABLE IF NOT EXISTS messages (
+        id BIGSERIAL PRIMARY KEY,
+        conversation_id BIGINT REFERENCES conversations(id),
+        timestamp TEXT NOT NULL,
+        role TEXT NOT NULL,
+        content TEXT NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS tool_calls (
+        id BIGSERIAL PRIMARY KEY,
+        conversation_id BIGINT REFERENCES conversations(id),
+        timestamp TEXT NOT NULL,
+        tool_name TEXT NOT NULL,
+        parameters TEXT,
+        result TEXT,
+        success INTEGER NOT NULL DEFAULT 1,
+        duration_ms DOUBLE PRECISION,
+        cached INTEGER NOT NULL DEFAULT 0
+    )""",
+    "ALTER TABLE tool_calls ADD COLUMN IF NOT EXISTS cached INTEGER NOT NULL DEFAULT 0",
+    """CREATE TABLE IF NOT EXISTS invoices (
+        id BIGSERIAL PRIMARY KEY,
+        invoice_number TEXT NOT NULL UNIQUE,
+        participant_identity TEXT NOT NULL,
+        amount DOUBLE PRECISION NOT NULL,
+        currency TEXT NOT NULL DEFAULT 'USD',
+        amount_paid DOUBLE PRECISION NOT NULL DEFAULT 0.0,
+        status TEXT NOT NULL DEFAULT 'unpaid',
+        issue_date TEXT,
+        due_date TEXT,
+        updated_at TEXT
+    )""",
+    """CREATE TABLE IF NOT EXISTS daily_rollups (
+        day TEXT PRIMARY KEY,
+        conversations INTEGER NOT NULL DEFAULT 0,
+        messages INTEGER NOT NULL DEFAULT 0,
+        duration_seconds INTEGER NOT NULL DEFAULT 0,
+        cost DOUBLE PRECISION NOT NULL DEFAULT 0.0
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_messages_conversation_time ON messages(conversation_id, timestamp)",
+    "CREATE INDEX IF NOT EXISTS idx_messages_time ON messages(timestamp)",
+    "CREATE INDEX IF NOT EXISTS idx_conversations_session ON conversations(session_id, start_time)",
+    "CREATE INDEX IF NOT EXISTS idx_conversations_participant ON conversations(participant_identity, start_time)",
+    "CREATE INDEX IF NOT EXISTS idx_conversations_start ON conversations(start_time)",
+    "CREATE INDEX IF NOT EXISTS idx_tool_calls_conversation ON tool_calls(conversation_id, timestamp)",
+    "CREATE INDEX IF NOT EXISTS idx_invoices_participant ON invoices(participant_identity, status)",
+]
+# pg_advisory_xact_lock key so concurrent workers create the schema once
+SCHEMA_LOCK = 0x766F6963
+
+
+class AsyncPostgresDB:
+    """ConversationDB API as coroutines over an asyncpg connection pool."""
+
+    def __init__(self, pool, daily_rollups=DB_DAILY_ROLLUPS):
+        self.pool = pool
+        self.daily_rollups = daily_rollups
+
+    @classmethod
+    async def connect(cls, dsn, pool_size=DB_POOL_SIZE, daily_rollups=DB_DAILY_ROLLUPS):
+        if asyncpg is None:
+            raise RuntimeError("The Postgres backend needs asyncpg (pip install asyncpg)")
+        pool = await asyncpg.create_pool(
+            dsn, min_size=1, max_size=max(1, pool_size),
+            statement_cache_size=DB_STATEMENT_CACHE,
+        )
+        db = cls(pool, daily_rollups)
+        await db._init_db()
+        return db
+
+    async def _init_db(self):
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute("SELECT pg_advisory_xact_lock($1)", SCHEMA_LOCK)
+                for statement in SCHEMA:
+                    await conn.execute(statement)
+
+    async def close(self):
+        await self.pool.close()
+
+    async def create_conversation(self, session_id, participant_identity="", participant_name=""):
+        return await self.pool.fetchval("""
+            INSERT INTO conversations (session_id, start_time, participant_identity, participant_name)
+            VALUES ($1, $2, $3, $4) RETURNING id
+        """, session_id, datetime.now().isoformat(), participant_identity, participant_name)
+
+    async def set_participant(self, conversation_id, participant_identity, participant_name=""):
+        await self.pool.execute("""
+            UPDATE conversations SET participant_identity = $1, participant_name = $2 WHERE id = $3
+        """, participant_identity, participant_name, conversation_id)
+
+    async def set_recording(self, session_id, recording_path):
+        return await self.pool.fetchval("""
+            UPDATE conversations SET recording_path = $1
+            WHERE id = (SELECT id FROM conversations WHERE session_id = $2 ORDER BY start_time DESC, id DESC LIMIT 1)
+            RETURNING id
+        """, recording_path, session_id)
+
+    async def set_agent_recording(self, conversation_id, recording_path):
+        await self.pool.execute("""
+            UPDATE conversations SET agent_recording_path = $1 WHERE id = $2
+        """, recording_path, conversation_id)
+
+    async def add_message(self, conversation_id, role, content):
+        await self.add_messages([(conversation_id, role, content, datetime.now().isoformat())])
+
+    async def add_messages(self, rows):
+        """Insert many (conversation_id, role, content, timestamp) rows in one transaction"""
+        rows = list(rows)
+        if not rows:
+            return
+        counts = {}
+        for conversation_id, _, _, _ in rows:
+            counts[conversation_id] = counts.get(conversation_id, 0) + 1
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.executemany("""
+                    INSERT INTO messages (conversation_id, role, content, timestamp)
+                    VALUES ($1, $2, $3, $4)
+                """, rows)
+                await conn.executemany("""
+                    UPDATE conversations SET message_count = message_count + $1 WHERE id = $2
+                """, [(count, conversation_id) for conversation_id, count in counts.items()])
+
+    async def end_conversation(self, conversation_id, cost=0.0, latency_summary=None):
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                row = await conn.fetchrow("""
+                    SELECT start_time, message_count, status FROM conversations WHERE id = $1 FOR UPDATE
+                """, conversation_id)
+                if not row:
+                    return
+                start = datetime.fromisoformat(row['start_time'])
+                duration = int((datetime.now() - start).total_seconds())
+                await conn.execute("""
+                    UPDATE conversations
+                    SET end_time = $1, duration_seconds = $2, cost = $3, status = 'completed',
+                        latency_summary = $4
+                    WHERE id = $5
+                """, datetime.now().isoformat(), duration, cost,
+                    json.dumps(latency_summary) if latency_summary else None, conversation_id)
+
+                if self.daily_rollups and row['status'] != 'completed':
+                    await conn.execute("""
+                        INSERT INTO daily_rollups (day, conversations, messages, duration_seconds, cost)
+                        VALUES ($1, 1, $2, $3, $4)
+                        ON CONFLICT (day) DO UPDATE SET
+                            conversations = daily_rollups.conversations + 1,
+                            messages = daily_rollups.messages + excluded.messages,
+                            duration_seconds = daily_rollups.duration_seconds + excluded.duration_seconds,
+                            cost = daily_rollups.cost + excluded.cost
+                    """, row['start_time'][:10], row['message_count'], duration, cost)
+
+    async def get_conversation(self, conversation_id):
+        row = await self.pool.fetchrow("SELECT * FROM conversations WHERE id = $1", conversation_id)
+        return dict(row) if row else None
+
+    async def get_messages(self, conversation_id):
+        rows = await self.pool.fetch("""
+            SELECT id, timestamp, role, content FROM messages
+            WHERE conversation_id = $1 ORDER BY timestamp, id
+        """, conversation_id)
+        return [dict(row) for row in rows]
+
+    async def get_transcript(self, conversation_id):
+        return "\n".join(
+            f"[{msg['timestamp']}] {msg['role']}: {msg['content']}"
+            for msg in await self.get_messages(conversation_id)
+        )
+
+    async def get_recent_conversations(self, participant_identity, limit=10):
+        rows = await self.pool.fetch("""
+            SELECT * FROM conversations
+            WHERE participant_identity = $1 ORDER BY start_time DESC LIMIT $2
+        """, participant_identity, limit)
+        return [dict(row) for row in rows]
+
+    async def get_question_answer_pairs(self, since, limit=5000):
+        rows = await self.pool.fetch("""
+            SELECT question, answer FROM (
+                SELECT conversation_id, role, content AS question, timestamp, id,
+                       LEAD(role) OVER w AS next_role,
+                       LEAD(content) OVER w AS answer,
+                       LEAD(timestamp) OVER w AS answered_at
+                FROM messages
+                WHERE timestamp >= $1
+                WINDOW w AS (PARTITION BY conversation_id ORDER BY timestamp, id)
+            ) pairs
+            WHERE role = 'user' AND next_role = 'assistant'
+              AND NOT EXISTS (
+                  SELECT 1 FROM tool_calls t
+                  WHERE t.conversation_id = pairs.conversation_id AND t.timestamp <= pairs.answered_at
+              )
+            ORDER BY timestamp DESC, id DESC
+            LIMIT $2
+        """, since, limit)
+        return [(row['question'], row['answer']) for row in reversed(rows)]
+
+    async def add_tool_call(self, conversation_id, tool_name, parameters, result, success=True, duration_ms=None,
+                            cached=False):
+        return await self.pool.fetchval("""
+            INSERT INTO tool_calls (conversation_id, timestamp, tool_name, parameters, result, success,
+                                    duration_ms, cached)
+            VALUES ($1, $2, $3, $4, $5, $6, $7, $8) RETURNING id
+        """, conversation_id, datetime.now().isoformat(), tool_name, json.dumps(parameters),
+            result, int(success), duration_ms, int(cached))
+
+    async def get_tool_calls_for_conversation(self, conversation_id):
+        rows = await self.pool.fetch("""
+            SELECT * FROM tool_calls WHERE conversation_id = $1 ORDER BY timestamp, id
+        """, conversation_id)
+        return [_tool_call(dict(row)) for row in rows]
+
+    async def upsert_invoice(self, invoice_number, participant_identity, amount, currency="USD",
+                             amount_paid=0.0, status="unpaid", issue_date=None, due_date=None):
+        await self.pool.execute("""
+            INSERT INTO invoices (invoice_number, participant_identity, amount, currency,
+                                  amount_paid, status, issue_date, due_date, updated_at)
+            VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)
+            ON CONFLICT (invoice_number) DO UPDATE SET
+                participant_identity = excluded.participant_identity,
+                amount = excluded.amount,
+                currency = excluded.currency,
+                amount_paid = excluded.amount_paid,
+                status = excluded.status,
+                issue_date = excluded.issue_date,
+                due_date = excluded.due_date,
+                updated_at = excluded.updated_at
+        """, invoice_number, participant_identity, amount, currency, amount_paid, status,
+            issue_date, due_date, datetime.now().isoformat())
+
+    async def get_invoice(self, invoice_number, participant_identity):
+        row = await self.pool.fetchrow("""
+            SELECT * FROM invoices WHERE invoice_number = $1 AND participant_identity = $2
+        """, invoice_number, participant_identity)
+        return dict(row) if row else None
+
+    async def get_open_invoices(self, participant_identity):
+        rows = await self.pool.fetch("""
+            SELECT * FROM invoices
+            WHERE participant_identity = $1 AND status != 'paid' ORDER BY due_date NULLS FIRST
+        """, participant_identity)
+        return [dict(row) for row in rows]
+
+
+class PostgresDB:
+    """Blocking facade over AsyncPostgresDB with the same API as ConversationDB.
+
+    The pool lives on a private event loop thread, so existing callers keep
+    using asyncio.to_thread / the tool executor unchanged, and every job in
+    a worker process shares one pool.
+    """
+
+    def __init__(self, dsn, pool_size=DB_POOL_SIZE, daily_rollups=DB_DAILY_ROLLUPS):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="pg-driver", daemon=True)
+        self._thread.start()
+        try:
+            self.db = self._run(AsyncPostgresDB.connect(dsn, pool_size, daily_rollups))
+        except BaseException:
+            self._stop()
+            raise
+
+    def _run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def _stop(self):
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    def close(self):
+        if self._loop.is_closed():
+            return
+        self._run(self.db.close())
+        self._stop()
+
+    def create_conversation(self, session_id, participant_identity="", participant_name=""):
+        return self._run(self.db.create_conversation(session_id, participant_identity, participant_name))
+
+    def set_participant(self, conversation_id, participant_identity, participant_name=""):
+        self._run(self.db.set_participant(conversation_id, participant_identity, participant_name))
+
+    def set_recording(self, session_id, recording_path):
+        return self._run(self.db.set_recording(session_id, recording_path))
+
+    def set_agent_recording(self, conversation_id, recording_path):
+        self._run(self.db.set_agent_recording(conversation_id, recording_path))
+
+    def add_message(self, conversation_id, role, content):
+        self._run(self.db.add_message(conversation_id, role, content))
+
+    def add_messages(self, rows):
+        self._run(self.db.add_messages(rows))
+
+    def end_conversation(self, conversation_id, cost=0.0, latency_summary=None):
+        self._run(self.db.end_conversation(conversation_id, cost, latency_summary))
+
+    def get_conversation(self, conversation_id):
+        return self._run(self.db.get_conversation(conversation_id))
+
+    def iter_messages(self, conversation_id, chunk_size=500):
+        yield from self._run(self.db.get_messages(conversation_id))
+
+    def iter_transcript(self, conversation_id, chunk_size=500):
+        for msg in self.iter_messages(conversation_id, chunk_size):
+            yield f"[{msg['timestamp']}] {msg['role']}: {msg['content']}"
+
+    def get_transcript(self, conversation_id):
+        return self._run(self.db.get_transcript(conversation_id))
+
+    def get_recent_conversations(self, participant_identity, limit=10):
+        return self._run(self.db.get_recent_conversations(participant_identity, limit))
+
+    def get_question_answer_pairs(self, since, limit=5000):
+        return self._run(self.db.get_question_answer_pairs(since, limit))
+
+    def add_tool_call(self, conversation_id, tool_name, parameters, result, success=True, duration_ms=None,
+                      cached=False):
+        return self._run(self.db.add_tool_call(conversation_id, tool_name, parameters, result,
+                                               success, duration_ms, cached))
+
+    def get_tool_calls_for_conversation(self, conversation_id):
+        return self._run(self.db.get_tool_calls_for_conversation(conversation_id))
+
+    def upsert_invoice(self, invoice_number, participant_identity, amount, currency="USD",
+                       amount_paid=0.0, status="unpaid", issue_date=None, due_date=None):
+        self._run(self.db.upsert_invoice(invoice_number, participant_identity, amount, currency,
+                                         amount_paid, status, issue_date, due_date))
+
+    def get_invoice(self, invoice_number, participant_identity):
+        return self._run(self.db.get_invoice(invoice_number, participant_identity))
+
+    def get_open_invoices(self, participant_identity):
+        return self._run(self.db.get_open_invoices(participant_identity))
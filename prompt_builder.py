@@ -0,0 +1,73 @@
+# prompt_builder.py
+import logging
+import textwrap
+from functools import lru_cache
+
+from prompts import IDENTITY, PRODUCT_SUMMARY, SCOPE, GREETING
+
+logger = logging.getLogger("prompts")
+
+# Order matters: the shared prefix must be byte-identical across sessions so
+# the provider's prompt cache can reuse it.
+SHARED_SECTIONS = (IDENTITY, PRODUCT_SUMMARY, SCOPE)
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+
+def _normalize(section):
+    return textwrap.dedent(section).strip()
+
+
+def assemble(sections):
+    """Join prompt sections, dropping blank and repeated paragraphs"""
+    seen = set()
+    paragraphs = []
+    for section in sections:
+        for paragraph in _normalize(section).split("\n\n"):
+            paragraph = paragraph.strip()
+            key = " ".join(paragraph.split())
+            if key and key not in seen:
+                seen.add(key)
+                paragraphs.append(paragraph)
+    return "\n\n".join(paragraphs)
+
+
+@lru_cache(maxsize=None)
+def shared_prefix():
+    """Agent instructions, built once per process"""
+    return assemble(SHARED_SECTIONS)
+
+
+@lru_cache(maxsize=None)
+def welcome_instructions():
+    """Welcome turn: the cached prefix plus a short greeting directive"""
+    return shared_prefix() + "\n\n" + _normalize(GREETING)
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    return tiktoken.get_encoding("o200k_base") if tiktoken else None
+
+
+def count_tokens(text):
+    """Token count with tiktoken when installed, else a ~4 chars/token estimate"""
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return (len(text) + 3) // 4
+
+
+def token_report():
+    prefix = count_tokens(shared_prefix())
+    welcome = count_tokens(welcome_instructions())
+    report = {
+        "instructions": prefix,
+        "welcome": welcome,
+        "welcome_uncached": welcome - prefix,
+        "exact": tiktoken is not None,
+    }
+    logger.info("prompt tokens: %s", report)
+    return report
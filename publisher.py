@@ -0,0 +1,160 @@
+# publisher.py
+import asyncio
+import json
+import logging
+import os
+import time
+import weakref
+from collections import deque
+
+import wire
+from latency import LATENCY
+
+logger = logging.getLogger("publisher")
+
+PUBLISH_TICK = float(os.getenv("PUBLISH_TICK", "0.1"))
+PUBLISH_MAX_PENDING = int(os.getenv("PUBLISH_MAX_PENDING", "256"))
+PUBLISH_MAX_RETRIES = 3
+PUBLISH_BACKOFF = 0.2
+# Keep reliable packets under LiveKit's recommended 15 KiB.
+MAX_PACKET_BYTES = 15_000
+
+# Frame types where only the newest pending frame matters. Partial
+# transcripts carry the full text so far, so they merge per speaker.
+MERGED_TYPES = ("cost", "status", "partial")
+
+STAT_NAMES = ("frames_sent", "packets_sent", "merged", "dropped", "retries")
+# Counters of closed publishers; live ones are added on read
+_closed_totals = dict.fromkeys(STAT_NAMES, 0)
+_live = weakref.WeakSet()
+
+
+def publisher_metrics():
+    """Process-wide publisher counters, for LATENCY.register"""
+    stats = dict(_closed_totals)
+    for publisher in list(_live):
+        for name in STAT_NAMES:
+            stats[name] += publisher._stats[name]
+    stats["rooms"] = len(_live)
+    return stats
+
+
+class DataPublisher:
+    """Per-room data-channel publisher.
+
+    Frames are queued without blocking and sent by one background task that
+    packs everything pending into a single packet per tick. Pending cost,
+    status and partial transcript frames are merged so only the newest one
+    goes out.
+    """
+
+    def __init__(self, room, tick=PUBLISH_TICK, max_pending=PUBLISH_MAX_PENDING,
+                 max_retries=PUBLISH_MAX_RETRIES, backoff=PUBLISH_BACKOFF, encoding="json"):
+        self.room = room
+        # Switched to "binary" once the browser announces it can decode it.
+        self.encoding = encoding
+        self.tick = tick
+        self.max_pending = max_pending
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._pending = deque()
+        self._latest = {}
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._stats = dict.fromkeys(STAT_NAMES, 0)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        _live.add(self)
+        return self
+
+    def send(self, frame: dict):
+        """Queue a frame for the next tick; returns False if it was dropped"""
+        if frame.get("type") in MERGED_TYPES:
+            key = (frame["type"], frame.get("speaker"))
+            if key in self._latest:
+                self._stats["merged"] += 1
+            self._latest[key] = frame
+        elif len(self._pending) >= self.max_pending:
+            self._stats["dropped"] += 1
+            return False
+        else:
+            self._pending.append(frame)
+            if frame.get("type") == "transcript":
+                # The committed text supersedes any partial still waiting.
+                self._latest.pop(("partial", frame.get("speaker")), None)
+        self._wakeup.set()
+        return True
+
+    async def aclose(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self._flush()
+        if self in _live:
+            _live.discard(self)
+            for name in STAT_NAMES:
+                _closed_totals[name] += self._stats[name]
+            logger.info("publisher closed: %s", self.metrics())
+
+    def metrics(self):
+        stats = dict(self._stats)
+        stats["pending"] = len(self._pending) + len(self._latest)
+        stats["encoding"] = self.encoding
+        return stats
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            # Let frames produced in the same burst share a packet.
+            await asyncio.sleep(self.tick)
+            await self._flush()
+
+    def _take(self):
+        frames = list(self._pending)
+        frames.extend(self._latest.values())
+        self._pending.clear()
+        self._latest.clear()
+        self._wakeup.clear()
+        return frames
+
+    def _packets(self, frames):
+        packet = []
+        size = 0
+        for frame in frames:
+            encoded = json.dumps(frame)
+            if packet and size + len(encoded) > MAX_PACKET_BYTES:
+                yield packet
+                packet, size = [], 0
+            packet.append(frame)
+            size += len(encoded)
+        if packet:
+            yield packet
+
+    async def _flush(self):
+        for frames in self._packets(self._take()):
+            frame = frames[0] if len(frames) == 1 else {"type": "batch", "frames": frames}
+            if await self._publish(wire.encode(frame, self.encoding)):
+                self._stats["packets_sent"] += 1
+                self._stats["frames_sent"] += len(frames)
+            else:
+                self._stats["dropped"] += len(frames)
+
+    async def _publish(self, payload: bytes):
+        for attempt in range(self.max_retries + 1):
+            try:
+                start = time.perf_counter()
+                await self.room.local_participant.publish_data(payload, reliable=True)
+                LATENCY.observe("publish", (time.perf_counter() - start) * 1000)
+                return True
+            except Exception as e:
+                if attempt == self.max_retries:
+                    logger.warning("dropping data packet after %d attempts: %s", attempt + 1, e)
+                    return False
+                self._stats["retries"] += 1
+                await asyncio.sleep(self.backoff * 2 ** attempt)
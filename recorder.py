@@ -0,0 +1,222 @@
+# recorder.py
+"""
+Agent-side call recording: caller and assistant audio mixed into one file
+Frames are pushed from the event loop; mixing and encoding run in a
+background thread per call. Needs numpy, and soundfile for FLAC/Opus.
+"""
+
+import logging
+import os
+import threading
+import time
+import wave
+from pathlib import Path
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import soundfile as sf
+except ImportError:
+    sf = None
+
+logger = logging.getLogger("recorder")
+
+# off, sip (callers without the browser client, which records itself) or all
+AGENT_RECORDING = os.getenv("AGENT_RECORDING", "sip")
+RECORDINGS_DIR = Path(os.getenv("RECORDINGS_DIR", "recordings"))
+# flac, opus or wav (wav needs no soundfile)
+RECORDING_FORMAT = os.getenv("RECORDING_FORMAT", "flac")
+# The realtime model speaks at 24 kHz; caller audio is resampled to match
+RECORDING_SAMPLE_RATE = int(os.getenv("RECORDING_SAMPLE_RATE", "24000"))
+# How far behind real time the mixer runs, so late caller frames still land
+RECORDING_DELAY = float(os.getenv("RECORDING_DELAY", "0.5"))
+# Most audio one source may have queued ahead of the mixer, in seconds
+RECORDING_MAX_BUFFER = float(os.getenv("RECORDING_MAX_BUFFER", "30"))
+
+FORMATS = {
+    "flac": ("flac", "FLAC", "PCM_16"),
+    "opus": ("ogg", "OGG", "OPUS"),
+    "wav": ("wav", None, None),
+}
+
+
+def recording_path(room_name, conversation_id, fmt=RECORDING_FORMAT, directory=RECORDINGS_DIR):
+    return Path(directory) / f"{room_name}-agent-{conversation_id}.{FORMATS[fmt][0]}"
+
+
+class _WaveEncoder:
+    def __init__(self, path, sample_rate):
+        self._file = wave.open(str(path), "wb")
+        self._file.setnchannels(1)
+        self._file.setsampwidth(2)
+        self._file.setframerate(sample_rate)
+
+    def write(self, block):
+        self._file.writeframes(block.tobytes())
+
+    def close(self):
+        self._file.close()
+
+
+def open_encoder(path, fmt=RECORDING_FORMAT, sample_rate=RECORDING_SAMPLE_RATE):
+    """Streaming mono 16-bit encoder with write(int16 array) and close()"""
+    if fmt not in FORMATS:
+        raise ValueError(f"unsupported recording format {fmt!r}; expected one of {', '.join(FORMATS)}")
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    _, container, subtype = FORMATS[fmt]
+    if container is None:
+        return _WaveEncoder(path, sample_rate)
+    if sf is None:
+        raise RuntimeError(f"{fmt} recordings need soundfile (pip install soundfile)")
+    return sf.SoundFile(str(path), "w", samplerate=sample_rate, channels=1, format=container, subtype=subtype)
+
+
+def to_mono(pcm, sample_rate, num_channels, out_rate):
+    """int16 interleaved PCM -> float32 mono at out_rate"""
+    samples = np.frombuffer(pcm, dtype=np.int16).astype(np.float32)
+    if num_channels > 1:
+        samples = samples.reshape(-1, num_channels).mean(axis=1)
+    if sample_rate != out_rate and len(samples):
+        n_out = len(samples) * out_rate // sample_rate
+        samples = np.interp(np.arange(n_out) * (sample_rate / out_rate), np.arange(len(samples)), samples)
+    return samples.astype(np.float32, copy=False)
+
+
+class SessionRecorder:
+    """Mixes the named sources of one call ("user", "assistant") into a file.
+
+    push() only places a copy of the frame on the timeline: frames continue
+    where the source left off, or start now if it has been silent for longer
+    than the jitter allowance. That keeps caller audio contiguous and lays
+    assistant audio, which the model produces faster than real time, out as
+    it is played. The mixer thread sums everything older than `delay`
+    seconds every `block` seconds and hands it to the encoder, so memory per
+    call stays bounded by `max_buffer` seconds per source.
+    """
+
+    def __init__(self, path, fmt=RECORDING_FORMAT, sample_rate=RECORDING_SAMPLE_RATE,
+                 delay=RECORDING_DELAY, max_buffer=RECORDING_MAX_BUFFER, block=0.1, clock=time.monotonic):
+        if np is None:
+            raise RuntimeError("Agent recording needs numpy (pip install numpy)")
+        self.path = Path(path)
+        self.sample_rate = sample_rate
+        self.delay = int(delay * sample_rate)
+        self.jitter = self.delay // 2
+        self.max_buffer = int(max_buffer * sample_rate)
+        self.block = block
+        self._clock = clock
+        self._encoder = open_encoder(self.path, fmt, sample_rate)
+        self._lock = threading.Lock()
+        self._started = None
+        self._incoming = []         # (source, start, pcm, sample_rate, num_channels)
+        self._cursors = {}          # source -> next free sample on the timeline
+        self._pending = {}          # source -> [(start, float32 samples)], mixer thread only
+        self._written = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._stats = {"frames": 0, "dropped_frames": 0, "late_samples": 0,
+                       "written_seconds": 0.0, "mix_ms": 0.0, "max_mix_ms": 0.0}
+
+    def _now(self):
+        return int((self._clock() - self._started) * self.sample_rate)
+
+    def start(self):
+        if self._thread is None:
+            self._started = self._clock()
+            self._thread = threading.Thread(target=self._run, name=f"recorder-{self.path.stem}", daemon=True)
+            self._thread.start()
+        return self
+
+    def push(self, source, pcm, sample_rate, num_channels=1):
+        """Queue one frame of int16 PCM (bytes or rtc.AudioFrame.data); returns False if it was dropped"""
+        if self._thread is None or self._stop.is_set():
+            return False
+        # AudioFrame.data is a memoryview cast to "h", whose len() counts samples
+        n_out = memoryview(pcm).nbytes // 2 // num_channels * self.sample_rate // sample_rate
+        with self._lock:
+            now = self._now()
+            cursor = self._cursors.get(source, 0)
+            # Continue a source that is still flowing; jitter alone is no gap
+            start = cursor if cursor >= now - self.jitter else now
+            if start - now > self.max_buffer:
+                self._stats["dropped_frames"] += 1
+                return False
+            self._cursors[source] = start + n_out
+            self._incoming.append((source, start, bytes(pcm), sample_rate, num_channels))
+            self._stats["frames"] += 1
+        return True
+
+    def interrupt(self, source):
+        """Drop audio of `source` that is queued but not yet due, e.g. an interrupted reply"""
+        with self._lock:
+            now = self._now()
+            if self._cursors.get(source, 0) > now:
+                self._cursors[source] = now
+            self._incoming.append((source, now, None, 0, 0))
+
+    def _take_incoming(self):
+        with self._lock:
+            incoming, self._incoming = self._incoming, []
+        for source, start, pcm, sample_rate, num_channels in incoming:
+            pending = self._pending.setdefault(source, [])
+            if pcm is None:
+                # Interrupt marker: cut everything scheduled from `start` on
+                pending[:] = [(s, samples[:max(0, start - s)]) for s, samples in pending if s < start]
+                continue
+            pending.append((start, to_mono(pcm, sample_rate, num_channels, self.sample_rate)))
+
+    def _mix(self, horizon):
+        """Encode the timeline from what was written so far up to `horizon`"""
+        if horizon <= self._written:
+            return
+        start = time.perf_counter()
+        mix = np.zeros(horizon - self._written, dtype=np.float32)
+        for pending in self._pending.values():
+            keep = []
+            for begin, samples in pending:
+                end = begin + len(samples)
+                if begin >= horizon:
+                    keep.append((begin, samples))
+                    continue
+                if begin < self._written:
+                    self._stats["late_samples"] += min(end, self._written) - begin
+                lo, hi = max(begin, self._written), min(end, horizon)
+                if hi > lo:
+                    mix[lo - self._written:hi - self._written] += samples[lo - begin:hi - begin]
+                if end > horizon:
+                    keep.append((horizon, samples[horizon - begin:]))
+            pending[:] = keep
+        self._encoder.write(np.clip(mix, -32768, 32767).astype(np.int16))
+        self._written = horizon
+        elapsed = (time.perf_counter() - start) * 1000
+        self._stats["mix_ms"] += elapsed
+        self._stats["max_mix_ms"] = max(self._stats["max_mix_ms"], elapsed)
+        self._stats["written_seconds"] = self._written / self.sample_rate
+
+    def _run(self):
+        try:
+            while not self._stop.wait(self.block):
+                self._take_incoming()
+                self._mix(self._now() - self.delay)
+            # Flush up to the hang-up; assistant audio queued past it was never heard
+            self._take_incoming()
+            self._mix(self._now())
+        except Exception:
+            logger.exception("recording %s failed", self.path)
+        finally:
+            self._encoder.close()
+
+    def close(self):
+        """Stop, flush and close the file (blocking); returns its path"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        else:
+            self._encoder.close()
+        return self.path
+
+    def metrics(self):
+        return dict(self._stats)
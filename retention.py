@@ -0,0 +1,240 @@
+# retention.py
+import asyncio
+import fcntl
+import gzip
+import json
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from db_driver import ConversationDB
+
+logger = logging.getLogger("retention")
+
+# JSON list of policies, e.g.
+# [{"max_age_days": 90, "action": "archive"},
+#  {"max_age_days": 1, "participant": "load-test", "action": "delete"}]
+RETENTION_POLICIES = os.getenv("RETENTION_POLICIES", "")
+# Seconds between background runs; 0 disables the background worker.
+RETENTION_INTERVAL = float(os.getenv("RETENTION_INTERVAL", "0"))
+# Conversations per delete transaction; live writes wait at most one batch.
+RETENTION_BATCH_SIZE = int(os.getenv("RETENTION_BATCH_SIZE", "50"))
+# Pause between batches so queued live writes get the write lock.
+RETENTION_PAUSE = float(os.getenv("RETENTION_PAUSE", "0.05"))
+RETENTION_VACUUM_PAGES = int(os.getenv("RETENTION_VACUUM_PAGES", "500"))
+ARCHIVE_DIR = Path(os.getenv("ARCHIVE_DIR", "archive"))
+
+DEFAULT_POLICIES = [
+    {"max_age_days": 90, "action": "archive"},
+    # Sessions whose worker died never reach 'completed'
+    {"max_age_days": 7, "status": ["active"], "action": "archive"},
+]
+# Policy action -> run counter
+ACTIONS = {"archive": "archived", "delete": "deleted"}
+
+
+class RetentionPolicy:
+    """Which conversations expire and what happens to them."""
+
+    def __init__(self, max_age_days, statuses=("completed",), participant=None, action="archive"):
+        if action not in ACTIONS:
+            raise ValueError(f"unknown retention action {action!r}, expected one of {tuple(ACTIONS)}")
+        self.max_age_days = float(max_age_days)
+        self.statuses = tuple(statuses)
+        self.participant = participant
+        self.action = action
+
+    @classmethod
+    def from_dict(cls, spec):
+        statuses = spec.get("status", ("completed",))
+        if isinstance(statuses, str):
+            statuses = (statuses,)
+        return cls(spec["max_age_days"], statuses, spec.get("participant"), spec.get("action", "archive"))
+
+    def cutoff(self, now=None):
+        return ((now or datetime.now()) - timedelta(days=self.max_age_days)).isoformat()
+
+    def __repr__(self):
+        who = f" participant={self.participant}" if self.participant else ""
+        return f"<{self.action} {'/'.join(self.statuses)} older than {self.max_age_days:g}d{who}>"
+
+
+def load_policies(spec=RETENTION_POLICIES):
+    """Policies from a JSON string or file path, falling back to DEFAULT_POLICIES"""
+    if not spec:
+        return [RetentionPolicy.from_dict(p) for p in DEFAULT_POLICIES]
+    if not spec.lstrip().startswith("["):
+        spec = Path(spec).read_text()
+    return [RetentionPolicy.from_dict(p) for p in json.loads(spec)]
+
+
+class RetentionEngine:
+    """Applies retention policies in bounded batches.
+
+    Archived conversations are written to gzipped JSON Lines files under
+    `archive_dir` (one line per conversation with its messages and tool
+    calls) before they are deleted. Each batch is its own short transaction.
+    """
+
+    def __init__(self, db: ConversationDB, policies=None, archive_dir=ARCHIVE_DIR,
+                 batch_size=RETENTION_BATCH_SIZE, pause=RETENTION_PAUSE,
+                 vacuum_pages=RETENTION_VACUUM_PAGES):
+        self.db = db
+        self.policies = load_policies() if policies is None else policies
+        self.archive_dir = Path(archive_dir)
+        self.batch_size = batch_size
+        self.pause = pause
+        self.vacuum_pages = vacuum_pages
+        self._stats = {
+            "runs": 0,
+            "archived": 0,
+            "deleted": 0,
+            "compacted": 0,
+            "freed_pages": 0,
+            "last_run_ms": 0.0,
+            "max_batch_ms": 0.0,
+        }
+
+    def run_once(self, dry_run=False, now=None):
+        """Apply every policy, compact and vacuum; returns this run's counts"""
+        start = time.perf_counter()
+        run = {"archived": 0, "deleted": 0, "compacted": 0, "freed_pages": 0}
+        for policy in self.policies:
+            if dry_run:
+                run[ACTIONS[policy.action]] += self._count(policy, now)
+                continue
+            while True:
+                rows = self.db.find_expired_conversations(
+                    policy.cutoff(now), policy.statuses, policy.participant, self.batch_size)
+                if not rows:
+                    break
+                run[ACTIONS[policy.action]] += self._apply(policy, rows)
+                time.sleep(self.pause)
+
+        if not dry_run:
+            while True:
+                compacted = self.db.compact_transcripts(self.batch_size)
+                run["compacted"] += compacted
+                if compacted < self.batch_size:
+                    break
+                time.sleep(self.pause)
+            while True:
+                freed = self.db.incremental_vacuum(self.vacuum_pages)
+                run["freed_pages"] += freed
+                if freed < self.vacuum_pages:
+                    break
+                time.sleep(self.pause)
+            self.db.optimize()
+
+            for key, value in run.items():
+                self._stats[key] += value
+            self._stats["runs"] += 1
+            self._stats["last_run_ms"] = (time.perf_counter() - start) * 1000
+        return run
+
+    def _count(self, policy, now):
+        count, after = 0, None
+        while True:
+            rows = self.db.find_expired_conversations(
+                policy.cutoff(now), policy.statuses, policy.participant, self.batch_size, after)
+            count += len(rows)
+            if len(rows) < self.batch_size:
+                return count
+            after = (rows[-1]['start_time'], rows[-1]['id'])
+
+    def _apply(self, policy, rows):
+        start = time.perf_counter()
+        if policy.action == "archive":
+            path = self.archive(rows)
+            logger.info("archived %d conversations to %s", len(rows), path)
+        deleted = self.db.delete_conversations(row['id'] for row in rows)
+        if policy.action == "delete":
+            # Archived conversations keep their recordings; the archive record points at them
+            for row in rows:
+                for column in ('recording_path', 'agent_recording_path'):
+                    if row.get(column):
+                        Path(row[column]).unlink(missing_ok=True)
+        self._stats["max_batch_ms"] = max(self._stats["max_batch_ms"], (time.perf_counter() - start) * 1000)
+        return deleted
+
+    def archive(self, rows):
+        """Write conversations to a new archive file; returns its path"""
+        month = rows[0]['start_time'][:7]
+        ids = [row['id'] for row in rows]
+        path = self.archive_dir / month / f"conversations-{min(ids)}-{max(ids)}.jsonl.gz"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        with gzip.open(tmp, "wt", encoding="utf-8") as f:
+            for row in rows:
+                record = dict(row, latency_summary=json.loads(row['latency_summary'] or "null"))
+                record.pop('transcript', None)
+                record["messages"] = list(self.db.iter_messages(row['id']))
+                record["tool_calls"] = self.db.get_tool_calls_for_conversation(row['id'])
+                f.write(json.dumps(record))
+                f.write("\n")
+        # Only rename once the file is complete, so a crash never leaves a
+        # partial archive for conversations that were then deleted.
+        os.replace(tmp, path)
+        return path
+
+    def metrics(self):
+        return dict(self._stats)
+
+
+def iter_archive(path):
+    """Yield archived conversation records from one archive file"""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            yield json.loads(line)
+
+
+class RetentionWorker:
+    """Runs a RetentionEngine every `interval` seconds off the event loop.
+
+    Only one process per database runs a pass at a time; the others skip
+    it, so every agent worker can start one safely.
+    """
+
+    def __init__(self, engine: RetentionEngine, interval=RETENTION_INTERVAL):
+        self.engine = engine
+        self.interval = interval
+        self._task = None
+        self._lock_path = f"{engine.db.db_path}.retention.lock"
+
+    def start(self):
+        if self.interval > 0 and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._run())
+        return self
+
+    async def aclose(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def run_exclusive(self):
+        """One engine pass if no other process holds the lock, else None"""
+        with open(self._lock_path, "w") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return None
+            try:
+                return self.engine.run_once()
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                run = await asyncio.to_thread(self.run_exclusive)
+                if run:
+                    logger.info("retention pass: %s", run)
+            except Exception:
+                logger.exception("retention pass failed")
@@ -0,0 +1,298 @@
+# token_service.py
+"""
+Standalone token and room service for the browser client
+Usage: python token_service.py [--host 127.0.0.1] [--port 8088] [--pool-size 2]
+
+GET /token          claim a warm room (agent already dispatched) and its token
+GET /token?room=R&identity=I
+                    token for a specific room, cached until close to expiry;
+                    needs TOKEN_SERVICE_SECRET
+GET /metrics        Prometheus text, including pool and cache counters
+"""
+
+import argparse
+import asyncio
+import hmac
+import logging
+import os
+import time
+import uuid
+from datetime import timedelta
+
+from aiohttp import web
+from dotenv import load_dotenv
+from livekit import api
+
+from latency import LATENCY
+
+load_dotenv()
+
+logger = logging.getLogger("token-service")
+
+LIVEKIT_URL = os.getenv("LIVEKIT_URL")
+LIVEKIT_API_KEY = os.getenv("LIVEKIT_API_KEY")
+LIVEKIT_API_SECRET = os.getenv("LIVEKIT_API_SECRET")
+
+TOKEN_SERVICE_PORT = int(os.getenv("TOKEN_SERVICE_PORT", "8088"))
+# Shared with app.py. When set, every /token request must send it as a
+# bearer token; without it, tokens for caller-chosen rooms are refused.
+TOKEN_SERVICE_SECRET = os.getenv("TOKEN_SERVICE_SECRET", "")
+TOKEN_TTL = float(os.getenv("TOKEN_TTL", "3600"))
+# Cached tokens are re-minted once less than this much validity is left.
+TOKEN_REFRESH_MARGIN = float(os.getenv("TOKEN_REFRESH_MARGIN", "300"))
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "4096"))
+ROOM_POOL_SIZE = int(os.getenv("ROOM_POOL_SIZE", "2"))
+# Unclaimed warm rooms are deleted after this long so idle agents are released.
+ROOM_POOL_TTL = float(os.getenv("ROOM_POOL_TTL", "300"))
+# Set when the agent registers with an explicit agent_name; otherwise the
+# default automatic dispatch sends an agent to every new room.
+AGENT_NAME = os.getenv("AGENT_NAME", "")
+
+
+def new_room_name():
+    return f"voice-assistant-{uuid.uuid4().hex[:8]}"
+
+
+def new_identity():
+    return f"user-{uuid.uuid4().hex[:6]}"
+
+
+def generate_token(room_name=None, identity=None, ttl=TOKEN_TTL):
+    """Mint a join token; returns (room_name, identity, jwt)"""
+    room_name = room_name or new_room_name()
+    identity = identity or new_identity()
+
+    token = api.AccessToken(LIVEKIT_API_KEY, LIVEKIT_API_SECRET)
+    token.with_identity(identity).with_name(identity).with_ttl(timedelta(seconds=ttl)).with_grants(
+        api.VideoGrants(
+            room_join=True,
+            room=room_name,
+            can_publish=True,
+            can_subscribe=True
+        )
+    )
+
+    return room_name, identity, token.to_jwt()
+
+
+class TokenCache:
+    """Minted tokens keyed by (room, identity), reused until close to expiry."""
+
+    def __init__(self, ttl=TOKEN_TTL, refresh_margin=TOKEN_REFRESH_MARGIN, max_entries=TOKEN_CACHE_SIZE):
+        self.ttl = ttl
+        self.refresh_margin = refresh_margin
+        self.max_entries = max_entries
+        self._entries = {}
+        self._stats = {"hits": 0, "minted": 0}
+
+    def get(self, room_name, identity, now=None):
+        now = time.monotonic() if now is None else now
+        key = (room_name, identity)
+        entry = self._entries.get(key)
+        if entry and entry[1] - now > self.refresh_margin:
+            self._stats["hits"] += 1
+            return entry[0]
+
+        start = time.perf_counter()
+        _, _, jwt = generate_token(room_name, identity, self.ttl)
+        LATENCY.observe("token_mint", (time.perf_counter() - start) * 1000)
+        self._stats["minted"] += 1
+        if len(self._entries) >= self.max_entries:
+            self._evict(now)
+        self._entries[key] = (jwt, now + self.ttl)
+        return jwt
+
+    def _evict(self, now):
+        for key in [k for k, (_, expires) in self._entries.items() if expires - now <= self.refresh_margin]:
+            del self._entries[key]
+        # Still full of live tokens: drop the oldest (dicts keep insertion order)
+        while len(self._entries) >= self.max_entries:
+            del self._entries[next(iter(self._entries))]
+
+    def metrics(self):
+        return dict(self._stats, size=len(self._entries))
+
+
+class RoomPool:
+    """Keeps `size` rooms created ahead of time, each with an agent dispatched.
+
+    A claimed room comes with a cached token for a fresh identity, so the
+    agent is already connected and the model session warm when the user
+    joins. Rooms nobody claims within `ttl` seconds are deleted.
+    """
+
+    def __init__(self, lkapi: api.LiveKitAPI, tokens: TokenCache, size=ROOM_POOL_SIZE, ttl=ROOM_POOL_TTL):
+        self.lkapi = lkapi
+        self.tokens = tokens
+        self.size = size
+        self.ttl = ttl
+        # (room_name, identity, created_at), oldest first
+        self._ready = []
+        self._creating = 0
+        self._wake = asyncio.Event()
+        self._task = None
+        self._stats = {"claimed": 0, "cold": 0, "created": 0, "expired": 0, "failed": 0}
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        return self
+
+    async def aclose(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for room_name, _, _ in self._ready:
+            await self._delete(room_name)
+        self._ready.clear()
+
+    async def claim(self):
+        """(room_name, identity, jwt, pooled) for a new conversation"""
+        now = time.monotonic()
+        while self._ready:
+            room_name, identity, created_at = self._ready.pop(0)
+            self._wake.set()
+            if now - created_at < self.ttl:
+                self._stats["claimed"] += 1
+                return room_name, identity, self.tokens.get(room_name, identity), True
+            asyncio.create_task(self._delete(room_name))
+            self._stats["expired"] += 1
+
+        # Pool is empty: create the room inline so the agent is dispatched
+        # now rather than on first join.
+        self._stats["cold"] += 1
+        room_name, identity = await self._create()
+        return room_name, identity, self.tokens.get(room_name, identity), False
+
+    async def _create(self):
+        start = time.perf_counter()
+        room_name, identity = new_room_name(), new_identity()
+        await self.lkapi.room.create_room(api.CreateRoomRequest(
+            name=room_name,
+            empty_timeout=int(self.ttl),
+            agents=[api.RoomAgentDispatch(agent_name=AGENT_NAME)] if AGENT_NAME else [],
+        ))
+        # Pre-mint so the claim itself never signs
+        self.tokens.get(room_name, identity)
+        self._stats["created"] += 1
+        LATENCY.observe("room_create", (time.perf_counter() - start) * 1000)
+        return room_name, identity
+
+    async def _delete(self, room_name):
+        try:
+            await self.lkapi.room.delete_room(api.DeleteRoomRequest(room=room_name))
+        except Exception:
+            logger.warning("failed to delete pooled room %s", room_name, exc_info=True)
+
+    async def _fill(self):
+        self._creating += 1
+        try:
+            self._ready.append((*await self._create(), time.monotonic()))
+        except Exception:
+            self._stats["failed"] += 1
+            logger.exception("failed to pre-create room")
+            await asyncio.sleep(1.0)
+        finally:
+            self._creating -= 1
+
+    async def _run(self):
+        while True:
+            now = time.monotonic()
+            while self._ready and now - self._ready[0][2] >= self.ttl:
+                room_name, _, _ = self._ready.pop(0)
+                self._stats["expired"] += 1
+                await self._delete(room_name)
+            missing = self.size - len(self._ready) - self._creating
+            if missing > 0:
+                await asyncio.gather(*(self._fill() for _ in range(missing)))
+                continue
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=min(self.ttl / 4, 30.0))
+            except asyncio.TimeoutError:
+                pass
+
+    def metrics(self):
+        return dict(self._stats, ready=len(self._ready), creating=self._creating)
+
+
+def authorized(request):
+    if not TOKEN_SERVICE_SECRET:
+        return False
+    supplied = request.headers.get("Authorization", "")
+    return hmac.compare_digest(supplied.encode(), f"Bearer {TOKEN_SERVICE_SECRET}".encode())
+
+
+async def handle_token(request):
+    start = time.perf_counter()
+    tokens, pool = request.app["tokens"], request.app["pool"]
+    room_name = request.query.get("room")
+    # A token for a named room and identity would let anyone join, or pose
+    # as the participant in, someone else's call
+    if (TOKEN_SERVICE_SECRET or room_name) and not authorized(request):
+        return web.json_response({"error": "unauthorized"}, status=401)
+    if room_name:
+        identity = request.query.get("identity") or new_identity()
+        jwt, pooled = tokens.get(room_name, identity), False
+    elif pool is not None and request.query.get("pool", "1") != "0":
+        room_name, identity, jwt, pooled = await pool.claim()
+    else:
+        room_name, identity = new_room_name(), new_identity()
+        jwt, pooled = tokens.get(room_name, identity), False
+    LATENCY.observe("token_request", (time.perf_counter() - start) * 1000)
+    return web.json_response({
+        "url": LIVEKIT_URL,
+        "room": room_name,
+        "identity": identity,
+        "token": jwt,
+        "pooled": pooled,
+    })
+
+
+async def handle_metrics(request):
+    return web.Response(text=LATENCY.render(), content_type="text/plain")
+
+
+def create_app(pool_size=ROOM_POOL_SIZE):
+    app = web.Application()
+    app["tokens"] = TokenCache()
+    LATENCY.register("token_cache", app["tokens"].metrics)
+
+    async def lifecycle(app):
+        lkapi = None
+        app["pool"] = None
+        if pool_size > 0:
+            lkapi = api.LiveKitAPI(LIVEKIT_URL, LIVEKIT_API_KEY, LIVEKIT_API_SECRET)
+            app["pool"] = RoomPool(lkapi, app["tokens"], pool_size).start()
+            LATENCY.register("room_pool", app["pool"].metrics)
+        yield
+        if app["pool"] is not None:
+            await app["pool"].aclose()
+        if lkapi is not None:
+            await lkapi.aclose()
+
+    app.cleanup_ctx.append(lifecycle)
+    app.router.add_get("/token", handle_token)
+    app.router.add_get("/metrics", handle_metrics)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LiveKit token and warm room service")
+    parser.add_argument('--host', default="127.0.0.1")
+    parser.add_argument('--port', type=int, default=TOKEN_SERVICE_PORT)
+    parser.add_argument('--pool-size', type=int, default=ROOM_POOL_SIZE, help="Warm rooms to keep (0 disables)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if not TOKEN_SERVICE_SECRET:
+        logger.warning("TOKEN_SERVICE_SECRET is not set; only fresh rooms will be handed out")
+    web.run_app(create_app(args.pool_size), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+"""
+Benchmark ConversationDB write throughput with simulated concurrent sessions
+Usage: python -m utils.bench_db [--sessions N] [--messages M] [--pool-sizes 0 8] [--check-plans]
+       python -m utils.bench_db --session-view 10000
+       python -m utils.bench_db --search 1000000
+       python -m utils.bench_db --retention 5000
+"""
+
+import argparse
+import itertools
+import random
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from db_driver import ConversationDB
+from latency import percentile
+from retention import RetentionEngine, RetentionPolicy
+
+
+def run_sessions(db: ConversationDB, sessions: int, messages: int):
+    """Drive `sessions` threads, each writing one conversation of `messages` lines"""
+    def worker(n):
+        conv_id = db.create_conversation(f"bench-{n}", f"user-{n}", f"User {n}")
+        for i in range(messages):
+            role = "user" if i % 2 == 0 else "assistant"
+            db.add_message(conv_id, role, f"message {i} from session {n}")
+        db.end_conversation(conv_id)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(sessions)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - start
+
+
+def bench_pool_size(pool_size: int, sessions: int, messages: int):
+    """Run one benchmark pass against a fresh database file"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db = ConversationDB(Path(tmp) / "bench.db", pool_size=pool_size)
+        try:
+            elapsed = run_sessions(db, sessions, messages)
+        finally:
+            db.close()
+    total = sessions * messages
+    return total, elapsed
+
+
+def seed_session(db: ConversationDB, session_id: str, messages: int, tool_every: int = 10):
+    """One long session with a tool call after every `tool_every` messages"""
+    conv_id = db.create_conversation(session_id, "bench-user", "Bench User")
+    rows = []
+    for i in range(messages):
+        role = "user" if i % 2 == 0 else "assistant"
+        rows.append((conv_id, role, f"message {i}", f"2026-01-01T00:00:{i // 1000:02d}.{i % 1000:03d}000"))
+    db.add_messages(rows)
+    with db._get_conn() as conn:
+        conn.executemany("""
+            INSERT INTO tool_calls (conversation_id, timestamp, tool_name, parameters, result, success)
+            VALUES (?, ?, ?, '{}', 'ok', 1)
+        """, [(conv_id, rows[i][3] + "1", "lookup") for i in range(0, messages, tool_every)])
+
+
+def view_per_message(db: ConversationDB, session_id: str):
+    """The old access pattern: one tool-call query per message"""
+    out = []
+    with db._get_conn() as conn:
+        msgs = conn.execute("""
+            SELECT m.* FROM conversations c JOIN messages m ON m.conversation_id = c.id
+            WHERE c.session_id = ? ORDER BY m.timestamp, m.id
+        """, (session_id,)).fetchall()
+    for i, msg in enumerate(msgs):
+        end = msgs[i + 1]['timestamp'] if i + 1 < len(msgs) else "9999"
+        with db._get_conn() as conn:
+            calls = conn.execute("""
+                SELECT * FROM tool_calls
+                WHERE conversation_id = ? AND timestamp >= ? AND timestamp < ?
+            """, (msg['conversation_id'], msg['timestamp'], end)).fetchall()
+        out.append((msg, calls))
+    return out
+
+
+def bench_session_view(messages: int):
+    """Time the per-message (N+1) view against iter_session_messages"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db = ConversationDB(Path(tmp) / "view.db")
+        try:
+            seed_session(db, "bench-view", messages)
+
+            start = time.perf_counter()
+            view_per_message(db, "bench-view")
+            n_plus_one = time.perf_counter() - start
+
+            start = time.perf_counter()
+            for _ in db.iter_session_messages("bench-view"):
+                pass
+            merged = time.perf_counter() - start
+        finally:
+            db.close()
+
+    print(f"\n{'='*60}")
+    print(f"SESSION VIEW - {messages} messages")
+    print(f"{'='*60}")
+    print(f"{'query per message':20} {n_plus_one * 1000:10.1f} ms")
+    print(f"{'iter_session_messages':20} {merged * 1000:10.1f} ms")
+
+
+SEARCH_WORDS = (
+    "invoice payment paypal stripe refund overdue reminder template currency tax "
+    "client estimate receipt export report account password login settings logo "
+    "recurring schedule discount balance due date email attachment signature"
+).split()
+SEARCH_QUERIES = ("paypal refund", "overdue reminder", "recurring invoice", "password")
+
+
+def seed_corpus(db: ConversationDB, messages: int, per_conversation: int = 200):
+    """Random support-style messages: common filler words plus a few rarer domain terms"""
+    rng = random.Random(42)
+    filler = [f"w{n}" for n in range(5000)]
+    cum_weights = list(itertools.accumulate(1 / (n + 1) for n in range(len(filler))))
+    for first in range(0, messages, per_conversation):
+        conv_id = db.create_conversation(f"search-{first}", f"user-{first % 97}", None)
+        rows = []
+        for i in range(first, min(first + per_conversation, messages)):
+            words = rng.choices(filler, cum_weights=cum_weights, k=rng.randint(6, 24))
+            words += rng.sample(SEARCH_WORDS, rng.randint(0, 2))
+            rng.shuffle(words)
+            rows.append((conv_id, "user" if i % 2 == 0 else "assistant", " ".join(words),
+                         f"2026-01-01T00:00:00.{i:06d}"))
+        db.add_messages(rows)
+
+
+def search_like(db: ConversationDB, query: str, limit: int = 20):
+    """The pre-FTS approach: a LIKE scan per word"""
+    words = query.split()
+    with db._get_conn() as conn:
+        return conn.execute(
+            "SELECT * FROM messages WHERE " + " AND ".join("content LIKE ?" for _ in words)
+            + " ORDER BY timestamp DESC LIMIT ?",
+            [f"%{word}%" for word in words] + [limit],
+        ).fetchall()
+
+
+def bench_search(messages: int):
+    """Time LIKE scans against the FTS index on a corpus of `messages` rows"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db = ConversationDB(Path(tmp) / "search.db")
+        try:
+            start = time.perf_counter()
+            seed_corpus(db, messages)
+            seeded = time.perf_counter() - start
+
+            print(f"\n{'='*60}")
+            print(f"SEARCH - {messages} messages (seeded in {seeded:.1f}s)")
+            print(f"{'='*60}")
+            print(f"{'query':20} {'LIKE':>12} {'FTS5':>12}")
+            for query in SEARCH_QUERIES:
+                start = time.perf_counter()
+                search_like(db, query)
+                like = time.perf_counter() - start
+
+                start = time.perf_counter()
+                db.search_messages(query)
+                fts = time.perf_counter() - start
+                print(f"{query:20} {like * 1000:9.1f} ms {fts * 1000:9.1f} ms")
+        finally:
+            db.close()
+
+
+def seed_old_conversations(db: ConversationDB, conversations: int, messages: int = 40):
+    """Completed conversations from last year, each with a legacy transcript copy"""
+    with db._get_conn() as conn:
+        for n in range(conversations):
+            start = f"2025-{1 + n % 12:02d}-01T00:00:{n % 60:02d}"
+            conv_id = conn.execute("""
+                INSERT INTO conversations (session_id, start_time, participant_identity, status, transcript)
+                VALUES (?, ?, ?, 'completed', ?)
+            """, (f"old-{n}", start, f"user-{n % 97}", "x" * 40 * messages)).lastrowid
+            conn.executemany("""
+                INSERT INTO messages (conversation_id, timestamp, role, content) VALUES (?, ?, ?, ?)
+            """, [(conv_id, start, "user" if i % 2 == 0 else "assistant", f"old message {i} " * 4)
+                  for i in range(messages)])
+    with db._get_conn() as conn:
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+
+def live_write_latency(db: ConversationDB, stop: threading.Event, sessions: int = 4):
+    """Per-message write latencies (ms) from `sessions` threads until `stop` is set"""
+    samples = []
+
+    def worker(n):
+        conv_id = db.create_conversation(f"live-{n}", f"user-{n}")
+        while not stop.is_set():
+            start = time.perf_counter()
+            db.add_message(conv_id, "user", "live message")
+            samples.append((time.perf_counter() - start) * 1000)
+            time.sleep(0.002)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(sessions)]
+    for t in threads:
+        t.start()
+    return threads, samples
+
+
+def bench_retention(conversations: int):
+    """Archive a year of old conversations while live sessions keep writing"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db = ConversationDB(Path(tmp) / "retention.db")
+        try:
+            seed_old_conversations(db, conversations)
+            size_before = db.file_size()
+            engine = RetentionEngine(db, [RetentionPolicy(30)], Path(tmp) / "archive")
+
+            stop = threading.Event()
+            threads, idle = live_write_latency(db, stop)
+            time.sleep(1.0)
+            stop.set()
+            for t in threads:
+                t.join()
+
+            stop = threading.Event()
+            threads, busy = live_write_latency(db, stop)
+            run = engine.run_once()
+            stop.set()
+            for t in threads:
+                t.join()
+            archives = sum(f.stat().st_size for f in (Path(tmp) / "archive").rglob("*.gz"))
+            size_after = db.file_size()
+        finally:
+            db.close()
+
+    print(f"\n{'='*60}")
+    print(f"RETENTION - {conversations} expired conversations")
+    print(f"{'='*60}")
+    print(f"archived {run['archived']} in {engine.metrics()['last_run_ms'] / 1000:.2f}s "
+          f"(slowest batch {engine.metrics()['max_batch_ms']:.0f} ms)")
+    print(f"database {size_before / 1e6:.1f} MB -> {size_after / 1e6:.1f} MB, archives {archives / 1e6:.1f} MB")
+    print(f"{'live writes':20} {'p50':>8} {'p99':>8} {'max':>8}")
+    for label, samples in (("idle", idle), ("during retention", busy)):
+        print(f"{label:20} {percentile(samples, 0.5):6.2f}ms {percentile(samples, 0.99):6.2f}ms "
+              f"{max(samples):6.2f}ms")
+
+
+def check_plans():
+    """Fail if any hot query plan scans a whole table on a freshly migrated schema"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db = ConversationDB(Path(tmp) / "plans.db")
+        try:
+            scans = db.full_table_scans()
+        finally:
+            db.close()
+
+    if not scans:
+        print("All hot queries are served from indexes")
+        return True
+
+    for name, detail in scans:
+        print(f"FULL SCAN in {name}: {detail}")
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ConversationDB write benchmark")
+    parser.add_argument('--sessions', '-n', type=int, default=20, help="Concurrent simulated sessions")
+    parser.add_argument('--messages', '-m', type=int, default=200, help="Messages per session")
+    parser.add_argument('--pool-sizes', type=int, nargs='+', default=[0, 8],
+                        help="Pool sizes to compare (0 = connect per call)")
+    parser.add_argument('--check-plans', action='store_true',
+                        help="Only verify hot queries use indexes (EXPLAIN QUERY PLAN)")
+
+    parser.add_argument('--session-view', type=int, metavar='MESSAGES',
+                        help="Only benchmark viewing one session of this many messages")
+    parser.add_argument('--search', type=int, metavar='MESSAGES',
+                        help="Only benchmark full-text search against LIKE on this many messages")
+    parser.add_argument('--retention', type=int, metavar='CONVERSATIONS',
+                        help="Only benchmark archiving this many expired conversations under live writes")
+
+    args = parser.parse_args()
+
+    if args.check_plans:
+        sys.exit(0 if check_plans() else 1)
+
+    if args.session_view:
+        bench_session_view(args.session_view)
+        return
+
+    if args.search:
+        bench_search(args.search)
+        return
+
+    if args.retention:
+        bench_retention(args.retention)
+        return
+
+    print(f"\n{'='*60}")
+    print(f"SESSIONS: {args.sessions}  MESSAGES/SESSION: {args.messages}")
+    print(f"{'='*60}")
+
+    for pool_size in args.pool_sizes:
+        total, elapsed = bench_pool_size(pool_size, args.sessions, args.messages)
+        label = "connect-per-call" if pool_size <= 0 else f"pool={pool_size}"
+        print(f"{label:20} {total:7} msgs in {elapsed:7.2f}s  {total / elapsed:10.1f} msgs/s")
+
+
+if __name__ == "__main__":
+    main()
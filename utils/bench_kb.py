@@ -0,0 +1,87 @@
+"""
+Benchmark knowledge base lookups: latency and the input tokens they cost per session
+Usage: python -m utils.bench_kb [--iterations N] [--turns T] [--questions Q] [--top-k K]
+
+The token figures compare against how the docs used to reach the model: once,
+as the welcome reply's instructions, which are not kept in the chat context.
+Looked-up snippets are tool output and stay in the context, so each one is
+read again on every later turn. Prompt caching discounts are ignored.
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from knowledge_base import KnowledgeBase, build_index, load_chunks, KB_TOP_K
+from latency import percentile
+from prompt_builder import count_tokens
+
+
+QUESTIONS = [
+    "How much does it cost?",
+    "Can I get paid through PayPal?",
+    "Does it back up to Google Drive or Dropbox?",
+    "Can I change the colors on my invoice template?",
+    "How do I record a partial payment?",
+    "Can my team work on invoices together?",
+    "Do I need to install anything on my phone?",
+    "Can I send estimates before an invoice?",
+]
+
+
+def lookup_turns(turns, questions):
+    """Turns at which the session's product questions are asked, spread evenly"""
+    return [int((q + 0.5) * turns / questions) for q in range(questions)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Knowledge base lookup benchmark")
+    parser.add_argument('--iterations', '-n', type=int, default=2000, help="Lookups to time")
+    parser.add_argument('--turns', '-t', type=int, default=20, help="Model turns per session")
+    parser.add_argument('--questions', '-q', type=int, default=5, help="Product questions per session")
+    parser.add_argument('--top-k', '-k', type=int, default=KB_TOP_K, help="Snippets per lookup")
+
+    args = parser.parse_args()
+
+    chunks = load_chunks()
+    full_doc_tokens = count_tokens("\n\n".join(f"{c['title']}: {c['text']}" for c in chunks))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        build_start = time.perf_counter()
+        index_path = build_index(chunks, Path(tmp) / "bench.kbx")
+        build_ms = (time.perf_counter() - build_start) * 1000
+        kb = KnowledgeBase(index_path)
+
+        timings = []
+        snippet_tokens = []
+        for i in range(args.iterations):
+            question = QUESTIONS[i % len(QUESTIONS)]
+            start = time.perf_counter()
+            snippets = kb.snippets(question, args.top_k)
+            timings.append((time.perf_counter() - start) * 1000)
+            if i < len(QUESTIONS):
+                snippet_tokens.append(count_tokens(snippets))
+        kb.close()
+
+    avg_snippet = sum(snippet_tokens) / len(snippet_tokens)
+    retrieved = avg_snippet * args.questions
+    # A snippet is input to the reply it was fetched for and every turn after
+    kb_input = sum(avg_snippet * (args.turns - turn) for turn in lookup_turns(args.turns, args.questions))
+    saved = full_doc_tokens - kb_input
+
+    print(f"\n{'='*60}")
+    print(f"KNOWLEDGE BASE - {len(chunks)} chunks, top-k={args.top_k}")
+    print(f"{'='*60}")
+    print(f"Index build:            {build_ms:.2f} ms")
+    print(f"Lookup p50/p95/p99:     {percentile(timings, 0.5) * 1000:.1f} / "
+          f"{percentile(timings, 0.95) * 1000:.1f} / {percentile(timings, 0.99) * 1000:.1f} us")
+    print(f"Docs in welcome reply:  {full_doc_tokens} input tokens per session (previous prompt)")
+    print(f"Snippets per lookup:    {avg_snippet:.0f} tokens")
+    print(f"Retrieved per session:  {retrieved:.0f} tokens ({args.questions} product questions)")
+    print(f"Snippet input:          {kb_input:.0f} tokens, kept in context over {args.turns} turns")
+    print(f"{'Saved' if saved >= 0 else 'Extra'} per session:      {abs(saved):.0f} input tokens")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Benchmark the client page: server render time and static asset load under concurrent users
+Usage: python -m utils.bench_page [--users N] [--renders R] [--asset-kb K]
+"""
+
+import argparse
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+import client_page
+import client_server
+from latency import percentile
+
+
+def legacy_render(url, token):
+    """The old path: resolve the whole page from its source on every rerun"""
+    page = client_page.TEMPLATE_PATH.read_text().replace(client_page.LIBRARY_MARKER, client_page.LIVEKIT_CLIENT_CDN)
+    head, tail = page.split(client_page.CONFIG_MARKER)
+    return head + '{"url": "' + url + '", "token": "' + token + '"}' + tail
+
+
+def run_users(users, per_user, fn):
+    """Call fn(user, i) from `users` threads; returns per-call latencies in ms and wall time"""
+    samples = []
+
+    def worker(user):
+        for i in range(per_user):
+            start = time.perf_counter()
+            fn(user, i)
+            samples.append((time.perf_counter() - start) * 1000)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(users)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return samples, time.perf_counter() - start
+
+
+def bench_render(users, renders):
+    token = "x" * 400
+    print(f"\n{'='*60}")
+    print(f"RENDER - {users} users x {renders} reruns")
+    print(f"{'='*60}")
+    for label, fn in (("rebuild per rerun", legacy_render), ("compiled template", client_page.render)):
+        samples, elapsed = run_users(users, renders, lambda user, i: fn("wss://example.livekit.cloud", token))
+        print(f"{label:20} {len(samples) / elapsed:10.0f} renders/s  p50 {percentile(samples, 0.5) * 1000:7.1f}us  "
+              f"p99 {percentile(samples, 0.99) * 1000:7.1f}us")
+
+
+def bench_assets(users, asset_kb):
+    with tempfile.TemporaryDirectory() as tmp:
+        static = Path(tmp)
+        (static / client_page.LIVEKIT_CLIENT_FILE).write_bytes(b"/* LivekitClient */" + b"x" * asset_kb * 1024)
+        handler = type("BenchHandler", (client_server.ClientHandler,), {"static_dir": static})
+        server = client_server.ClientHTTPServer(("127.0.0.1", 0), handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_port}/static/{client_page.LIVEKIT_CLIENT_FILE}"
+
+        with urllib.request.urlopen(url) as resp:
+            etag = resp.headers["ETag"]
+            cache_control = resp.headers["Cache-Control"]
+
+        def first_load(user, i):
+            with urllib.request.urlopen(url) as resp:
+                resp.read()
+
+        def revalidate(user, i):
+            request = urllib.request.Request(url, headers={"If-None-Match": etag})
+            try:
+                urllib.request.urlopen(request)
+            except urllib.error.HTTPError as e:
+                if e.code != 304:
+                    raise
+
+        print(f"\n{'='*60}")
+        print(f"ASSET LOAD - {users} concurrent users, {asset_kb} KB library")
+        print(f"{'='*60}")
+        print(f"Cache-Control: {cache_control}")
+        for label, fn in (("first load", first_load), ("revalidate (304)", revalidate)):
+            samples, elapsed = run_users(users, 5, fn)
+            print(f"{label:20} {len(samples) / elapsed:10.0f} req/s  p50 {percentile(samples, 0.5):6.2f}ms  "
+                  f"p99 {percentile(samples, 0.99):6.2f}ms")
+        print("Later page loads within max-age skip the request entirely.")
+        server.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Client page render and asset benchmark")
+    parser.add_argument('--users', '-u', type=int, default=50, help="Concurrent Streamlit users")
+    parser.add_argument('--renders', '-r', type=int, default=200, help="Reruns per user")
+    parser.add_argument('--asset-kb', type=int, default=400, help="Size of the stand-in client library")
+    args = parser.parse_args()
+
+    bench_render(args.users, args.renders)
+    bench_assets(args.users, args.asset_kb)
+
+
+if __name__ == "__main__":
+    main()
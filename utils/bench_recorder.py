@@ -0,0 +1,119 @@
+"""
+Benchmark agent-side recording: CPU per concurrent call for each format
+Usage: python -m utils.bench_recorder [--calls 1 10 25] [--formats wav flac opus] [--seconds S]
+
+Every simulated call pushes 10 ms caller frames in real time and, every few
+seconds, an assistant reply delivered faster than real time, the way the
+realtime model streams it. The same traffic without a recorder is measured
+first, and its CPU is subtracted from every row.
+"""
+
+import argparse
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from recorder import RECORDING_SAMPLE_RATE, SessionRecorder, recording_path
+
+FRAME = 0.01
+REPLY_EVERY = 6.0
+REPLY_SECONDS = 3.0
+REPLY_SPEEDUP = 4
+
+
+class NullRecorder:
+    def push(self, source, pcm, sample_rate, num_channels=1):
+        return True
+
+    def close(self):
+        pass
+
+    def metrics(self):
+        return {"dropped_frames": 0, "late_samples": 0, "max_mix_ms": 0.0}
+
+
+def frame_data(samples):
+    """int16 samples shaped like rtc.AudioFrame.data, a memoryview cast to 'h'"""
+    return memoryview(samples.astype(np.int16).tobytes()).cast("h")
+
+
+def make_audio(rate):
+    t = np.arange(int(rate * FRAME)) / rate
+    caller = frame_data(np.sin(2 * np.pi * 220 * t) * 6000)
+    # 100 ms assistant frames, as the model streams them
+    t = np.arange(int(rate * 0.1)) / rate
+    assistant = frame_data(np.sin(2 * np.pi * 330 * t) * 6000)
+    return caller, assistant
+
+
+async def simulate_call(recorder, seconds, offset, lag):
+    caller, assistant = make_audio(RECORDING_SAMPLE_RATE)
+    start = time.perf_counter()
+    next_reply = offset
+    tick = 0
+    while tick * FRAME < seconds:
+        due = start + tick * FRAME
+        lag.append(max(0.0, time.perf_counter() - due) * 1000)
+        recorder.push("user", caller, RECORDING_SAMPLE_RATE)
+        if tick * FRAME >= next_reply:
+            next_reply += REPLY_EVERY
+            asyncio.create_task(simulate_reply(recorder, assistant))
+        tick += 1
+        await asyncio.sleep(max(0.0, start + tick * FRAME - time.perf_counter()))
+
+
+async def simulate_reply(recorder, frame):
+    for _ in range(int(REPLY_SECONDS / 0.1)):
+        recorder.push("assistant", frame, RECORDING_SAMPLE_RATE)
+        await asyncio.sleep(0.1 / REPLY_SPEEDUP)
+
+
+async def run(calls, fmt, seconds, directory):
+    """(cpu_seconds, loop lag samples, recorder metrics, bytes written) for `calls` concurrent calls"""
+    if fmt is None:
+        recorders = [NullRecorder() for _ in range(calls)]
+    else:
+        recorders = [SessionRecorder(recording_path(f"bench-{fmt}", n, fmt, directory), fmt).start()
+                     for n in range(calls)]
+    lag = []
+    cpu = time.process_time()
+    await asyncio.gather(*(simulate_call(r, seconds, n * REPLY_EVERY / calls, lag)
+                           for n, r in enumerate(recorders)))
+    await asyncio.gather(*(asyncio.to_thread(r.close) for r in recorders))
+    cpu = time.process_time() - cpu
+    size = sum(p.stat().st_size for p in Path(directory).glob(f"bench-{fmt}-*")) if fmt else 0
+    return cpu, lag, [r.metrics() for r in recorders], size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Agent recording CPU benchmark")
+    parser.add_argument('--calls', '-c', type=int, nargs='+', default=[1, 10, 25], help="Concurrent calls")
+    parser.add_argument('--formats', '-f', nargs='+', default=['wav', 'flac', 'opus'],
+                        choices=['wav', 'flac', 'opus'])
+    parser.add_argument('--seconds', '-s', type=float, default=10.0, help="Length of each simulated call")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for calls in args.calls:
+            print(f"\n{'='*60}")
+            print(f"RECORDING - {calls} concurrent calls x {args.seconds:.0f}s at {RECORDING_SAMPLE_RATE} Hz")
+            print(f"{'='*60}")
+            base_cpu, base_lag, _, _ = asyncio.run(run(calls, None, args.seconds, tmp))
+            print(f"{'format':8} {'CPU/call':>9} {'loop lag p99':>13} {'max mix':>8} {'dropped':>8} {'KB/min':>8}")
+            print(f"{'none':8} {base_cpu / args.seconds / calls * 100:8.2f}% "
+                  f"{np.percentile(base_lag, 99):11.1f}ms {'-':>8} {'-':>8} {'-':>8}")
+            for fmt in args.formats:
+                cpu, lag, stats, size = asyncio.run(run(calls, fmt, args.seconds, tmp))
+                per_call = (cpu - base_cpu) / args.seconds / calls * 100
+                max_mix = max(s["max_mix_ms"] for s in stats)
+                dropped = sum(s["dropped_frames"] for s in stats)
+                kb_per_min = size / 1024 / calls / (args.seconds / 60)
+                print(f"{fmt:8} {per_call:8.2f}% {np.percentile(lag, 99):11.1f}ms {max_mix:6.1f}ms "
+                      f"{dropped:8} {kb_per_min:8.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""
+Benchmark the client transcript and log views on a long session in a real browser
+Usage: python -m utils.bench_transcript [--messages N] [--per-frame F] [--out bench_transcript.html] [--chrome PATH]
+
+Writes the client page with a benchmark script injected. Open the file in a
+browser and read the result at the bottom of the page, or pass --chrome to
+run it headless and print the result here. The old append-everything path is
+replayed first on a plain copy of the views, then the page's own
+log/updatePartial/addTranscript functions get the same stream.
+"""
+
+import argparse
+import json
+import re
+import subprocess
+from pathlib import Path
+
+import client_page
+
+BENCH_SCRIPT = """
+<pre id="bench-result">running...</pre>
+<script>
+(function() {
+    const MESSAGES = %(messages)d;
+    const PER_FRAME = %(per_frame)d;
+    const PARTIALS = 3;
+
+    // The views as they were before windowing: every line and bubble stays
+    // in the DOM and each update scrolls immediately.
+    function legacyViews() {
+        const box = document.createElement('div');
+        box.style.cssText = 'max-height: 400px; overflow-y: auto;';
+        const transcript = document.createElement('div');
+        const logs = document.createElement('div');
+        logs.style.cssText = 'max-height: 200px; overflow-y: auto;';
+        box.appendChild(transcript);
+        document.body.appendChild(box);
+        document.body.appendChild(logs);
+        const pending = {};
+
+        function bubble(speaker) {
+            const msgDiv = document.createElement('div');
+            msgDiv.className = 'transcript-msg ' + (speaker === 'You' ? 'user-msg' : 'assistant-msg');
+            msgDiv.innerHTML = '<div class="msg-label"></div><div class="msg-text"></div>';
+            msgDiv.firstChild.textContent = speaker;
+            transcript.appendChild(msgDiv);
+            return msgDiv;
+        }
+        return {
+            log(msg) {
+                logs.innerHTML += '[' + new Date().toLocaleTimeString() + '] ' + msg + '<br>';
+                logs.scrollTop = logs.scrollHeight;
+            },
+            updatePartial(speaker, text) {
+                let msgDiv = pending[speaker];
+                if (!msgDiv) {
+                    msgDiv = pending[speaker] = bubble(speaker);
+                    msgDiv.classList.add('partial-msg');
+                }
+                msgDiv.lastChild.textContent = text;
+                box.scrollTop = box.scrollHeight;
+            },
+            addTranscript(speaker, text) {
+                const msgDiv = pending[speaker] || bubble(speaker);
+                delete pending[speaker];
+                msgDiv.classList.remove('partial-msg');
+                msgDiv.lastChild.textContent = text;
+                box.scrollTop = box.scrollHeight;
+            },
+            remove() {
+                box.remove();
+                logs.remove();
+            },
+        };
+    }
+
+    function feed(views, n) {
+        const speaker = n %% 2 ? 'Assistant' : 'You';
+        const text = 'Message ' + n + ': how do I send invoice INV-' + (1000 + n) + ' to a customer by email today?';
+        for (let p = 1; p <= PARTIALS; p++) {
+            views.updatePartial(speaker, text.slice(0, Math.round(text.length * p / (PARTIALS + 1))));
+        }
+        views.log('Transcript: ' + speaker + ': ' + text.slice(0, 40));
+        views.addTranscript(speaker, text);
+    }
+
+    // Feeds PER_FRAME messages per animation frame, the way a burst of data
+    // packets arrives, and measures the gaps between frames.
+    function run(views) {
+        return new Promise(resolve => {
+            const frames = [];
+            let n = 0;
+            let last = performance.now();
+            const start = last;
+            function step(now) {
+                frames.push(now - last);
+                last = now;
+                for (let i = 0; i < PER_FRAME && n < MESSAGES; i++) feed(views, n++);
+                if (n < MESSAGES) {
+                    requestAnimationFrame(step);
+                    return;
+                }
+                // One more frame so the windowed views flush their queue
+                requestAnimationFrame(() => {
+                    document.body.offsetHeight;
+                    frames.sort((a, b) => a - b);
+                    resolve({
+                        total_ms: Math.round(performance.now() - start),
+                        longest_frame_ms: Math.round(frames[frames.length - 1]),
+                        p95_frame_ms: Math.round(frames[Math.floor(frames.length * 0.95)]),
+                        dom_nodes: document.getElementsByTagName('*').length,
+                        heap_mb: performance.memory
+                            ? Math.round(performance.memory.usedJSHeapSize / 1048576 * 10) / 10 : null,
+                    });
+                });
+            }
+            requestAnimationFrame(step);
+        });
+    }
+
+    window.addEventListener('load', async () => {
+        const baseline = document.getElementsByTagName('*').length;
+        const legacy = legacyViews();
+        const before = await run(legacy);
+        legacy.remove();
+        const after = await run({ log, updatePartial, addTranscript });
+        after.history = transcriptHistory.length;
+        document.getElementById('bench-result').textContent = 'BENCH ' + JSON.stringify({
+            messages: MESSAGES, per_frame: PER_FRAME, baseline_nodes: baseline, legacy: before, windowed: after,
+        });
+    });
+})();
+</script>
+"""
+
+
+def bench_page(messages, per_frame):
+    page = client_page.render("wss://bench.invalid", "bench-token")
+    script = BENCH_SCRIPT % {"messages": messages, "per_frame": per_frame}
+    return page.replace("</body>", script + "</body>")
+
+
+def run_chrome(chrome, path, budget_ms=600000):
+    """Load the page headless and return the parsed result, or None if it never finished"""
+    output = subprocess.run(
+        [chrome, "--headless", "--disable-gpu", "--no-sandbox", "--enable-precise-memory-info",
+         f"--virtual-time-budget={budget_ms}", "--dump-dom", path.resolve().as_uri()],
+        capture_output=True, text=True, timeout=budget_ms / 1000 + 60,
+    ).stdout
+    match = re.search(r"BENCH (\{.*?\})</pre>", output)
+    return json.loads(match.group(1).replace("&quot;", '"')) if match else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Client transcript rendering benchmark")
+    parser.add_argument('--messages', '-m', type=int, default=5000, help="Messages in the simulated session")
+    parser.add_argument('--per-frame', '-f', type=int, default=20, help="Messages delivered per animation frame")
+    parser.add_argument('--out', default="bench_transcript.html", help="Where to write the benchmark page")
+    parser.add_argument('--chrome', metavar='PATH', help="Run headless with this Chrome/Chromium binary")
+    args = parser.parse_args()
+
+    out = Path(args.out)
+    out.write_text(bench_page(args.messages, args.per_frame))
+    print(f"Wrote {out}")
+    if not args.chrome:
+        print("Open it in a browser; the result appears at the bottom of the page.")
+        return
+
+    result = run_chrome(args.chrome, out)
+    if result is None:
+        print("No result: the page did not finish within the time budget")
+        return
+    print(f"\n{'='*60}")
+    print(f"TRANSCRIPT VIEW - {result['messages']} messages, {result['per_frame']} per frame")
+    print(f"{'='*60}")
+    print(f"{'':10} {'total':>9} {'longest':>9} {'p95':>7} {'DOM nodes':>10} {'heap':>8}")
+    for label in ("legacy", "windowed"):
+        r = result[label]
+        heap = f"{r['heap_mb']}MB" if r['heap_mb'] is not None else "-"
+        print(f"{label:10} {r['total_ms']:7}ms {r['longest_frame_ms']:7}ms {r['p95_frame_ms']:5}ms "
+              f"{r['dom_nodes']:10} {heap:>8}")
+    print(f"Full history kept for download: {result['windowed']['history']} messages")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Micro-benchmark of data-channel encodings: encode/decode time and bytes on wire
+Usage: python -m utils.bench_wire [--iterations N]
+"""
+
+import argparse
+import time
+
+import wire
+
+
+SAMPLES = {
+    "short transcript": {"type": "transcript", "speaker": "You", "text": "How do I connect PayPal?"},
+    "long transcript": {
+        "type": "transcript",
+        "speaker": "Assistant",
+        "text": ("Simple Invoice Manager lets you create professional invoices, estimates and "
+                 "receipts, track partial or full payments, and back up to Google Drive or Dropbox. ") * 8,
+    },
+    "cost": {"type": "cost", "total": 0.012345, "audio_input_seconds": 42.5,
+             "audio_output_seconds": 61.0, "text_tokens": 1834},
+}
+SAMPLES["batch"] = {"type": "batch", "frames": list(SAMPLES.values())}
+
+
+def time_per_call(fn, arg, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn(arg)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Wire format micro-benchmark")
+    parser.add_argument('--iterations', '-n', type=int, default=20000, help="Iterations per measurement")
+
+    args = parser.parse_args()
+
+    print(f"\n{'='*72}")
+    print(f"{'frame':18} {'encoding':8} {'bytes':>7} {'encode us':>11} {'decode us':>11}")
+    print(f"{'='*72}")
+
+    for name, frame in SAMPLES.items():
+        for encoding in wire.ENCODINGS:
+            payload = wire.encode(frame, encoding)
+            assert wire.decode(payload)["type"] == frame["type"]
+            encode_us = time_per_call(lambda f: wire.encode(f, encoding), frame, args.iterations)
+            decode_us = time_per_call(wire.decode, payload, args.iterations)
+            print(f"{name:18} {encoding:8} {len(payload):7} {encode_us:11.2f} {decode_us:11.2f}")
+
+
+if __name__ == "__main__":
+    main()
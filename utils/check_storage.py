@@ -0,0 +1,236 @@
+"""
+Conformance and throughput checks shared by every storage backend
+Usage: python -m utils.check_storage [--backends memory sqlite] [--postgres DSN] [--sessions N] [--messages M]
+
+Postgres runs only when a DSN is given, e.g. against a local server:
+    python -m utils.check_storage --postgres postgresql://postgres@localhost/voice_test
+"""
+
+import argparse
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from storage import STORAGE_API, open_storage
+
+
+def check_api(db):
+    missing = [name for name in STORAGE_API if not callable(getattr(db, name, None))]
+    assert not missing, f"missing methods: {missing}"
+
+
+def check_conversation_lifecycle(db):
+    conv_id = db.create_conversation("conf-session", "", "")
+    conv = db.get_conversation(conv_id)
+    assert conv["session_id"] == "conf-session" and conv["status"] == "active", conv
+
+    db.set_participant(conv_id, "conf-user", "Conf User")
+    db.add_message(conv_id, "user", "How do I send an invoice?")
+    db.add_messages([
+        (conv_id, "assistant", "Tap Send on the invoice.", "9999-01-01T00:00:01"),
+        (conv_id, "user", "Thanks", "9999-01-01T00:00:02"),
+    ])
+    db.end_conversation(conv_id, 0.25, {"turn": {"count": 1}})
+
+    conv = db.get_conversation(conv_id)
+    assert conv["participant_identity"] == "conf-user", conv
+    assert conv["status"] == "completed" and conv["end_time"], conv
+    assert conv["message_count"] == 3, conv
+    assert abs(conv["cost"] - 0.25) < 1e-9, conv
+    assert conv["latency_summary"] and "turn" in conv["latency_summary"], conv
+    assert db.get_conversation(10 ** 9) is None
+
+
+def check_recording_link(db):
+    session = f"conf-recording-{uuid.uuid4().hex[:8]}"
+    assert db.set_recording(session, "recordings/none.webm") is None
+    db.create_conversation(session, "conf-recording-user")
+    latest = db.create_conversation(session, "conf-recording-user")
+    assert db.set_recording(session, "recordings/take.webm") == latest
+    assert db.get_conversation(latest)["recording_path"] == "recordings/take.webm"
+    db.set_agent_recording(latest, "recordings/take-agent.flac")
+    assert db.get_conversation(latest)["agent_recording_path"] == "recordings/take-agent.flac"
+
+
+def check_messages_ordered(db):
+    conv_id = db.create_conversation("conf-order", "conf-order-user")
+    db.add_messages([
+        (conv_id, "assistant", "second", "2026-01-01T00:00:02"),
+        (conv_id, "user", "first", "2026-01-01T00:00:01"),
+        (conv_id, "user", "third", "2026-01-01T00:00:02"),
+    ])
+    msgs = list(db.iter_messages(conv_id))
+    assert [m["content"] for m in msgs] == ["first", "second", "third"], msgs
+    assert set(msgs[0]) == {"id", "timestamp", "role", "content"}, msgs[0]
+    assert db.get_transcript(conv_id).splitlines()[0] == "[2026-01-01T00:00:01] user: first"
+    assert list(db.iter_transcript(conv_id)) == db.get_transcript(conv_id).splitlines()
+
+
+def check_recent_conversations(db):
+    ids = [db.create_conversation(f"conf-recent-{n}", "conf-recent-user") for n in range(3)]
+    db.create_conversation("conf-recent-other", "someone-else")
+    recent = db.get_recent_conversations("conf-recent-user", 2)
+    assert len(recent) == 2, recent
+    assert all(c["participant_identity"] == "conf-recent-user" for c in recent)
+    assert recent[0]["start_time"] >= recent[1]["start_time"]
+    assert {c["id"] for c in recent} <= set(ids)
+
+
+def check_question_answer_pairs(db):
+    # Tagged so reruns against a persistent server see only this run's rows
+    tag = uuid.uuid4().hex[:8]
+    conv_id = db.create_conversation("conf-qa", "conf-qa-user")
+    db.add_messages([
+        (conv_id, "user", f"what does it cost {tag}", "8888-01-01T00:00:01"),
+        (conv_id, "assistant", "it is free", "8888-01-01T00:00:02"),
+        (conv_id, "user", f"no reply yet {tag}", "8888-01-01T00:00:03"),
+    ])
+    # Replies after a customer-data tool call may carry that customer's data
+    private_id = db.create_conversation("conf-qa-private", "conf-qa-user")
+    db.add_tool_call(private_id, "list_open_invoices", {}, "[]", True, 1.0)
+    db.add_messages([
+        (private_id, "user", f"what do I owe you {tag}", "8888-01-01T00:00:04"),
+        (private_id, "assistant", "nothing is open", "8888-01-01T00:00:05"),
+    ])
+    pairs = [pair for pair in db.get_question_answer_pairs("8888-01-01") if tag in pair[0]]
+    assert pairs == [(f"what does it cost {tag}", "it is free")], pairs
+
+
+def check_tool_calls(db):
+    conv_id = db.create_conversation("conf-tools", "conf-tools-user")
+    first = db.add_tool_call(conv_id, "get_invoice_status", {"invoice_number": "A1"}, '{"ok": 1}', True, 12.5)
+    db.add_tool_call(conv_id, "list_open_invoices", {}, "Error: down", False)
+    db.add_tool_call(conv_id, "get_invoice_status", {"invoice_number": "A1"}, '{"ok": 1}', True, 0.1, cached=True)
+    calls = db.get_tool_calls_for_conversation(conv_id)
+    assert [c["tool_name"] for c in calls] == ["get_invoice_status", "list_open_invoices", "get_invoice_status"], calls
+    assert [c["cached"] for c in calls] == [0, 0, 1], calls
+    assert calls[0]["id"] == first and calls[0]["parameters"] == {"invoice_number": "A1"}, calls[0]
+    assert calls[0]["success"] == 1 and calls[1]["success"] == 0, calls
+    assert calls[0]["duration_ms"] == 12.5 and calls[1]["duration_ms"] is None, calls
+
+
+def check_invoices(db):
+    db.upsert_invoice("CONF-1", "conf-billing", 100.0, due_date="2026-03-01")
+    db.upsert_invoice("CONF-2", "conf-billing", 50.0, status="paid", amount_paid=50.0)
+    db.upsert_invoice("CONF-3", "conf-billing", 75.0, due_date="2026-02-01")
+    db.upsert_invoice("CONF-1", "conf-billing", 100.0, amount_paid=40.0, status="partial", due_date="2026-03-01")
+
+    invoice = db.get_invoice("CONF-1", "conf-billing")
+    assert invoice["amount_paid"] == 40.0 and invoice["status"] == "partial", invoice
+    assert db.get_invoice("CONF-1", "someone-else") is None
+    assert [i["invoice_number"] for i in db.get_open_invoices("conf-billing")] == ["CONF-3", "CONF-1"]
+
+
+def check_concurrent_writes(db):
+    conv_id = db.create_conversation("conf-concurrent", "conf-concurrent-user")
+
+    def worker(n):
+        for i in range(25):
+            db.add_message(conv_id, "user", f"thread {n} message {i}")
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert db.get_conversation(conv_id)["message_count"] == 200
+    assert len(list(db.iter_messages(conv_id))) == 200
+
+
+CHECKS = [
+    check_api,
+    check_conversation_lifecycle,
+    check_recording_link,
+    check_messages_ordered,
+    check_recent_conversations,
+    check_question_answer_pairs,
+    check_tool_calls,
+    check_invoices,
+    check_concurrent_writes,
+]
+
+
+def run_checks(db):
+    """Run every conformance check; returns the number that failed"""
+    failed = 0
+    for check in CHECKS:
+        try:
+            check(db)
+            print(f"  PASS {check.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"  FAIL {check.__name__}: {type(e).__name__}: {e}")
+    return failed
+
+
+def throughput(db, sessions, messages, batch=50):
+    """Messages/s for per-message writes from concurrent sessions, then for batched writes"""
+    def per_message(n):
+        conv_id = db.create_conversation(f"tp-{n}", f"tp-user-{n}")
+        for i in range(messages):
+            db.add_message(conv_id, "user" if i % 2 == 0 else "assistant", f"message {i}")
+        db.end_conversation(conv_id)
+
+    def batched(n):
+        conv_id = db.create_conversation(f"tp-batch-{n}", f"tp-user-{n}")
+        rows = [(conv_id, "user", f"message {i}", f"2026-01-01T00:00:{i % 60:02d}") for i in range(messages)]
+        for start in range(0, messages, batch):
+            db.add_messages(rows[start:start + batch])
+        db.end_conversation(conv_id)
+
+    results = {}
+    for label, fn in (("add_message", per_message), (f"add_messages x{batch}", batched)):
+        threads = [threading.Thread(target=fn, args=(n,)) for n in range(sessions)]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        results[label] = sessions * messages / (time.perf_counter() - start)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Storage backend conformance and throughput")
+    parser.add_argument('--backends', nargs='+', default=['memory', 'sqlite'], choices=['memory', 'sqlite'],
+                        help="Local backends to check")
+    parser.add_argument('--postgres', metavar='DSN', help="Also check a Postgres server (needs asyncpg)")
+    parser.add_argument('--sessions', '-n', type=int, default=20, help="Concurrent sessions for throughput")
+    parser.add_argument('--messages', '-m', type=int, default=200, help="Messages per session for throughput")
+    args = parser.parse_args()
+
+    failed = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        urls = {
+            'memory': "memory://",
+            'sqlite': f"sqlite:///{Path(tmp) / 'conformance.db'}",
+        }
+        targets = [(name, urls[name]) for name in args.backends]
+        if args.postgres:
+            targets.append(('postgres', args.postgres))
+
+        for name, url in targets:
+            print(f"\n{'='*60}")
+            print(f"BACKEND: {name}")
+            print(f"{'='*60}")
+            try:
+                db = open_storage(url)
+            except Exception as e:
+                failed += 1
+                print(f"  FAIL open_storage: {type(e).__name__}: {e}")
+                continue
+            try:
+                failed += run_checks(db)
+                for label, rate in throughput(db, args.sessions, args.messages).items():
+                    print(f"  {label:20} {rate:10.1f} msgs/s")
+            finally:
+                db.close()
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
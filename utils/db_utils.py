@@ -1,61 +1,63 @@
 """
 Utility script to query and analyze voice assistant conversations
-Usage: python db_utils.py [command] [arguments]
+Usage: python -m utils.db_utils [command] [arguments]
 """
 
 import argparse
-from db_driver import DatabaseDriver
+from db_driver import ConversationDB, DB_PATH
+from utils.export import FORMATS, write_export
+from retention import RetentionEngine, load_policies, ARCHIVE_DIR
 from datetime import datetime
 import json
 
 
-def print_conversation(conv):
-    """Pretty print a conversation entry"""
-    timestamp = datetime.fromisoformat(conv.timestamp).strftime('%Y-%m-%d %H:%M:%S')
-    speaker_label = "🤖 ASSISTANT" if conv.speaker == "assistant" else "👤 USER"
+def print_conversation(msg):
+    """Pretty print a message entry"""
+    timestamp = datetime.fromisoformat(msg['timestamp']).strftime('%Y-%m-%d %H:%M:%S')
+    speaker_label = "🤖 ASSISTANT" if msg['role'] == "assistant" else "👤 USER"
     print(f"\n[{timestamp}] {speaker_label}")
-    print(f"  {conv.message}")
-    if conv.metadata:
-        print(f"  Metadata: {conv.metadata}")
+    print(f"  {msg['content']}")
 
 
 def print_tool_call(tool):
     """Pretty print a tool call"""
-    timestamp = datetime.fromisoformat(tool.timestamp).strftime('%Y-%m-%d %H:%M:%S')
-    status = "✓" if tool.success else "✗"
-    print(f"\n[{timestamp}] {status} TOOL: {tool.tool_name}")
-    print(f"  Parameters: {json.dumps(tool.parameters, indent=4)}")
-    if tool.result:
-        print(f"  Result: {tool.result}")
+    timestamp = datetime.fromisoformat(tool['timestamp']).strftime('%Y-%m-%d %H:%M:%S')
+    status = "✓" if tool['success'] else "✗"
+    print(f"\n[{timestamp}] {status} TOOL: {tool['tool_name']}")
+    print(f"  Parameters: {json.dumps(tool['parameters'], indent=4)}")
+    if tool['result']:
+        print(f"  Result: {tool['result']}")
 
 
-def view_session(db: DatabaseDriver, session_id: str):
+def view_session(db: ConversationDB, session_id: str):
     """View all conversations in a session"""
-    conversations = db.get_conversation_history(session_id)
+    count = 0
+    found = False
+    for msg in db.iter_session_messages(session_id):
+        if not found:
+            found = True
+            print(f"\n{'='*60}")
+            print(f"SESSION: {session_id}")
+            print(f"{'='*60}")
+        # Tool calls made before their conversation's first message come alone
+        if msg['role'] is not None:
+            count += 1
+            print_conversation(msg)
+        for tool in msg['tool_calls']:
+            print_tool_call(tool)
     
-    if not conversations:
+    if not found:
         print(f"No conversations found for session: {session_id}")
         return
     
-    print(f"\n{'='*60}")
-    print(f"SESSION: {session_id}")
-    print(f"Total messages: {len(conversations)}")
-    print(f"{'='*60}")
-    
-    for conv in conversations:
-        print_conversation(conv)
-        
-        # Check for tool calls
-        tool_calls = db.get_tool_calls_for_conversation(conv.id)
-        for tool in tool_calls:
-            print_tool_call(tool)
-    
-    print(f"\n{'='*60}\n")
+    print(f"\nTotal messages: {count}")
+    print(f"{'='*60}\n")
 
 
-def list_sessions(db: DatabaseDriver):
-    """List all sessions"""
-    sessions = db.get_active_sessions()
+def list_sessions(db: ConversationDB, limit: int = 10, cursor: str = None):
+    """List one page of sessions, newest first"""
+    after = tuple(cursor.split('|', 1)) if cursor else None
+    sessions, next_cursor = db.list_sessions(limit, after)
     
     print(f"\n{'='*60}")
     print("ALL SESSIONS")
@@ -66,21 +68,42 @@ def list_sessions(db: DatabaseDriver):
         return
     
     for session in sessions:
-        count = db.get_conversation_count(session['session_id'])
         start = datetime.fromisoformat(session['start_time']).strftime('%Y-%m-%d %H:%M:%S')
         end = session['end_time']
-        status = "ACTIVE" if not end else "ENDED"
+        status = "ACTIVE" if session['active'] else "ENDED"
         
         print(f"\nSession ID: {session['session_id']}")
-        print(f"  Participant: {session['participant_id']}")
+        print(f"  Participant: {session['participant_identity']}")
         print(f"  Status: {status}")
         print(f"  Start: {start}")
         if end:
             print(f"  End: {datetime.fromisoformat(end).strftime('%Y-%m-%d %H:%M:%S')}")
-        print(f"  Messages: {count}")
+        print(f"  Messages: {session['messages']}")
+        print(f"  Duration: {session['duration_seconds']}s  Cost: ${session['cost']:.4f}")
+    
+    if next_cursor:
+        print(f"\nNext page: --cursor '{next_cursor[0]}|{next_cursor[1]}'")
+
+
+def daily_stats(db: ConversationDB, since: str = None, until: str = None):
+    """Show per-day totals from the rollup table"""
+    days = db.get_daily_stats(since or "", until or "9999")
+    
+    print(f"\n{'='*60}")
+    print("DAILY TOTALS")
+    print(f"{'='*60}\n")
+    
+    if not days:
+        print("No completed conversations recorded")
+        return
+    
+    print(f"{'Day':12} {'Convs':>6} {'Messages':>9} {'Minutes':>9} {'Cost':>10}")
+    for day in days:
+        print(f"{day['day']:12} {day['conversations']:6} {day['messages']:9} "
+              f"{day['duration_seconds'] / 60:9.1f} {day['cost']:10.4f}")
 
 
-def recent_conversations(db: DatabaseDriver, participant_id: str, limit: int = 10):
+def recent_conversations(db: ConversationDB, participant_id: str, limit: int = 10):
     """Show recent conversations for a participant"""
     conversations = db.get_recent_conversations(participant_id, limit)
     
@@ -93,10 +116,12 @@ def recent_conversations(db: DatabaseDriver, participant_id: str, limit: int = 1
     print(f"{'='*60}")
     
     for conv in conversations:
-        print_conversation(conv)
+        start = datetime.fromisoformat(conv['start_time']).strftime('%Y-%m-%d %H:%M:%S')
+        print(f"\n[{start}] Session {conv['session_id']} ({conv['status']})")
+        print(f"  Messages: {conv['message_count']}  Duration: {conv['duration_seconds']}s  Cost: ${conv['cost']:.4f}")
 
 
-def tool_stats(db: DatabaseDriver, session_id: str = None):
+def tool_stats(db: ConversationDB, session_id: str = None):
     """Show tool usage statistics"""
     stats = db.get_tool_usage_stats(session_id)
     
@@ -110,88 +135,151 @@ def tool_stats(db: DatabaseDriver, session_id: str = None):
         print("No tool calls recorded")
         return
     
-    total = sum(stats.values())
+    total = stats[0]['total']
     print(f"Total tool calls: {total}\n")
     
-    for tool_name, count in sorted(stats.items(), key=lambda x: x[1], reverse=True):
-        percentage = (count / total) * 100
+    for row in stats:
+        percentage = (row['calls'] / total) * 100
         bar = "█" * int(percentage / 2)
-        print(f"{tool_name:20} {bar} {count:3} ({percentage:.1f}%)")
+        avg = f"{row['avg_ms']:.0f}ms" if row['avg_ms'] is not None else "-"
+        print(f"{row['tool_name']:20} {bar} {row['calls']:3} ({percentage:.1f}%)  "
+              f"ok {row['succeeded']}/{row['calls']}  cached {row['cached']}  avg {avg}")
+
+
+def search_messages(db: ConversationDB, query: str, participant_id: str = None,
+                    since: str = None, until: str = None, limit: int = 10, page: int = 1):
+    """Full-text search over message content, best match first"""
+    offset = (page - 1) * limit
+    results = db.search_messages(query, participant_id, since, until, limit, offset)
+    
+    print(f"\n{'='*60}")
+    print(f"SEARCH: {query}  (page {page})")
+    print(f"{'='*60}")
+    
+    if not results:
+        print("No matching messages")
+        return
+    
+    for hit in results:
+        timestamp = datetime.fromisoformat(hit['timestamp']).strftime('%Y-%m-%d %H:%M:%S')
+        speaker_label = "🤖 ASSISTANT" if hit['role'] == "assistant" else "👤 USER"
+        print(f"\n[{timestamp}] {speaker_label}  Session {hit['session_id']} ({hit['participant_identity']})")
+        print(f"  {hit['snippet']}")
+    
+    if len(results) == limit:
+        print(f"\nNext page: --page {page + 1}")
 
 
-def delete_session_data(db: DatabaseDriver, session_id: str):
+def delete_session_data(db: ConversationDB, session_id: str):
     """Delete all data for a session"""
     confirm = input(f"Are you sure you want to delete session '{session_id}'? (yes/no): ")
     
     if confirm.lower() == 'yes':
-        db.delete_session_data(session_id)
-        print(f"Session '{session_id}' deleted successfully")
+        deleted = db.delete_session_data(session_id)
+        print(f"Session '{session_id}' deleted successfully ({deleted} conversations)")
     else:
         print("Deletion cancelled")
 
 
-def export_session(db: DatabaseDriver, session_id: str, output_file: str):
-    """Export session to JSON file"""
-    conversations = db.get_conversation_history(session_id)
+def prune(db: ConversationDB, policies: str = None, archive_dir: str = None, dry_run: bool = False):
+    """Apply retention policies: archive or delete expired conversations, then compact"""
+    engine = RetentionEngine(db, load_policies(policies) if policies else None,
+                             archive_dir or ARCHIVE_DIR)
     
-    if not conversations:
-        print(f"No conversations found for session: {session_id}")
-        return
+    print(f"\n{'='*60}")
+    print(f"RETENTION{' (dry run)' if dry_run else ''}")
+    print(f"{'='*60}\n")
+    for policy in engine.policies:
+        print(f"  {policy}")
     
-    export_data = {
+    size_before = db.file_size()
+    run = engine.run_once(dry_run=dry_run)
+    verb = "Would" if dry_run else "Did"
+    print(f"\n{verb} archive {run['archived']} and delete {run['deleted']} conversations")
+    if not dry_run:
+        elapsed = engine.metrics()['last_run_ms'] / 1000
+        print(f"Compacted {run['compacted']} legacy transcripts, freed {run['freed_pages']} pages")
+        print(f"Database {size_before / 1e6:.1f} MB -> {db.file_size() / 1e6:.1f} MB in {elapsed:.2f}s")
+        if not db.incremental_vacuum_enabled():
+            print("Incremental vacuum is off for this file; run 'vacuum' once to enable it")
+
+
+def enable_vacuum(db: ConversationDB):
+    """Convert the database file to incremental auto-vacuum"""
+    if db.incremental_vacuum_enabled():
+        print("Incremental vacuum is already enabled")
+        return
+    confirm = input("This rewrites the whole database file and blocks writers meanwhile. Continue? (yes/no): ")
+    if confirm.lower() == 'yes':
+        size_before = db.file_size()
+        db.enable_incremental_vacuum()
+        print(f"Incremental vacuum enabled ({size_before / 1e6:.1f} MB -> {db.file_size() / 1e6:.1f} MB)")
+    else:
+        print("Cancelled")
+
+
+def report_export(count: int, elapsed: float, output_file: str):
+    """Print export row count and throughput"""
+    rate = count / elapsed if elapsed > 0 else 0.0
+    print(f"Exported {count} messages to: {output_file} ({elapsed:.2f}s, {rate:,.0f} rows/sec)")
+
+
+def export_session(db: ConversationDB, session_id: str, output_file: str, fmt: str = 'json', compress: bool = False):
+    """Export session to a file, streaming rows as they are read"""
+    header = {
         "session_id": session_id,
         "export_date": datetime.utcnow().isoformat(),
-        "conversations": []
     }
+    count, elapsed = write_export(db.iter_session_messages(session_id), output_file, fmt, compress, header)
     
-    for conv in conversations:
-        conv_data = {
-            "id": conv.id,
-            "speaker": conv.speaker,
-            "message": conv.message,
-            "timestamp": conv.timestamp,
-            "metadata": conv.metadata
-        }
-        
-        # Add tool calls if any
-        tool_calls = db.get_tool_calls_for_conversation(conv.id)
-        if tool_calls:
-            conv_data["tool_calls"] = [
-                {
-                    "tool_name": t.tool_name,
-                    "parameters": t.parameters,
-                    "result": t.result,
-                    "timestamp": t.timestamp,
-                    "success": t.success
-                }
-                for t in tool_calls
-            ]
-        
-        export_data["conversations"].append(conv_data)
+    if not count:
+        raise SystemExit(f"No conversations found for session: {session_id}; {output_file} not written")
     
-    with open(output_file, 'w') as f:
-        json.dump(export_data, f, indent=2)
+    report_export(count, elapsed, output_file)
+
+
+def export_range(db: ConversationDB, since: str, until: str, output_file: str, fmt: str = 'jsonl', compress: bool = False):
+    """Export every session started in [since, until) in one pass"""
+    header = {
+        "since": since,
+        "until": until,
+        "export_date": datetime.utcnow().isoformat(),
+    }
+    count, elapsed = write_export(db.iter_messages_between(since, until), output_file, fmt, compress, header)
     
-    print(f"Session exported to: {output_file}")
+    if not count:
+        raise SystemExit(f"No conversations found between {since} and {until}; {output_file} not written")
+    
+    report_export(count, elapsed, output_file)
 
 
 def main():
     parser = argparse.ArgumentParser(description="Voice Assistant Database Utilities")
     parser.add_argument('command', choices=[
-        'list', 'view', 'recent', 'stats', 'delete', 'export'
+        'list', 'view', 'recent', 'stats', 'daily', 'search', 'delete', 'export', 'prune', 'vacuum'
     ], help="Command to execute")
     parser.add_argument('--session', '-s', help="Session ID")
     parser.add_argument('--participant', '-p', help="Participant ID")
     parser.add_argument('--limit', '-l', type=int, default=10, help="Limit for results")
+    parser.add_argument('--cursor', '-c', help="Page cursor printed by the previous 'list' page")
     parser.add_argument('--output', '-o', help="Output file for export")
-    parser.add_argument('--db', default="voice_assistant.sqlite", help="Database path")
+    parser.add_argument('--format', '-f', choices=FORMATS, help="Export format (default: json for a session, jsonl for a range)")
+    parser.add_argument('--gzip', action='store_true', help="Gzip the export (implied by a .gz output name)")
+    parser.add_argument('--query', '-q', help="Words to search for in message content")
+    parser.add_argument('--page', type=int, default=1, help="Result page for 'search'")
+    parser.add_argument('--since', help="Only sessions started at or after this ISO date (export, daily; message time for search)")
+    parser.add_argument('--until', help="Only sessions started before this ISO date (export, daily; message time for search)")
+    parser.add_argument('--policies', help="Retention policies for 'prune' as JSON or a JSON file (default: RETENTION_POLICIES)")
+    parser.add_argument('--archive-dir', help="Where 'prune' writes archive files (default: ARCHIVE_DIR)")
+    parser.add_argument('--dry-run', action='store_true', help="Only count what 'prune' would remove")
+    parser.add_argument('--db', default=str(DB_PATH), help="Database path")
     
     args = parser.parse_args()
     
-    db = DatabaseDriver(args.db)
+    db = ConversationDB(args.db)
     
     if args.command == 'list':
-        list_sessions(db)
+        list_sessions(db, args.limit, args.cursor)
     
     elif args.command == 'view':
         if not args.session:
@@ -208,6 +296,16 @@ def main():
     elif args.command == 'stats':
         tool_stats(db, args.session)
     
+    elif args.command == 'daily':
+        daily_stats(db, args.since, args.until)
+    
+    elif args.command == 'search':
+        if not args.query:
+            print("Error: --query is required for 'search' command")
+            return
+        search_messages(db, args.query, args.participant, args.since, args.until,
+                        args.limit, max(1, args.page))
+    
     elif args.command == 'delete':
         if not args.session:
             print("Error: --session is required for 'delete' command")
@@ -215,10 +313,23 @@ def main():
         delete_session_data(db, args.session)
     
     elif args.command == 'export':
-        if not args.session or not args.output:
-            print("Error: --session and --output are required for 'export' command")
+        if not args.output or not (args.session or args.since):
+            print("Error: --output and either --session or --since are required for 'export' command")
             return
-        export_session(db, args.session, args.output)
+        try:
+            if args.session:
+                export_session(db, args.session, args.output, args.format or 'json', args.gzip)
+            else:
+                until = args.until or datetime.now().isoformat()
+                export_range(db, args.since, until, args.output, args.format or 'jsonl', args.gzip)
+        except RuntimeError as e:
+            print(f"Error: {e}")
+    
+    elif args.command == 'prune':
+        prune(db, args.policies, args.archive_dir, args.dry_run)
+    
+    elif args.command == 'vacuum':
+        enable_vacuum(db)
 
 
 if __name__ == "__main__":
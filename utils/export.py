@@ -0,0 +1,134 @@
+"""
+Streaming writers for conversation exports
+Rows are written as they are read, so memory stays flat for any export size.
+"""
+
+import csv
+import gzip
+import itertools
+import json
+import time
+
+FORMATS = ('json', 'jsonl', 'csv', 'parquet')
+
+CSV_FIELDS = ['session_id', 'conversation_id', 'id', 'timestamp', 'speaker', 'message', 'tool_calls']
+PARQUET_BATCH = 10000
+
+
+def export_record(msg):
+    """Flatten a message row from the driver into an export record"""
+    record = {
+        "session_id": msg['session_id'],
+        "conversation_id": msg['conversation_id'],
+        "id": msg['id'],
+        "timestamp": msg['timestamp'],
+        "speaker": msg['role'],
+        "message": msg['content'],
+    }
+    if msg['tool_calls']:
+        record["tool_calls"] = [
+            {
+                "tool_name": t['tool_name'],
+                "parameters": t['parameters'],
+                "result": t['result'],
+                "timestamp": t['timestamp'],
+                "success": bool(t['success']),
+                "cached": bool(t.get('cached')),
+            }
+            for t in msg['tool_calls']
+        ]
+    return record
+
+
+def _open(path, compress):
+    if compress or path.endswith('.gz'):
+        return gzip.open(path, 'wt', encoding='utf-8', newline='')
+    return open(path, 'w', encoding='utf-8', newline='')
+
+
+def write_jsonl(records, f):
+    count = 0
+    for record in records:
+        f.write(json.dumps(record))
+        f.write("\n")
+        count += 1
+    return count
+
+
+def write_json(records, f, header):
+    """One JSON document, written element by element"""
+    prefix = json.dumps(header)[:-1] + (", " if header else "")
+    f.write(prefix + '"conversations": [')
+    count = 0
+    for record in records:
+        f.write(",\n" if count else "\n")
+        f.write(json.dumps(record, indent=2))
+        count += 1
+    f.write("\n]}\n")
+    return count
+
+
+def write_csv(records, f):
+    writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+    writer.writeheader()
+    count = 0
+    for record in records:
+        record = dict(record)
+        record["tool_calls"] = json.dumps(record.get("tool_calls", []))
+        writer.writerow(record)
+        count += 1
+    return count
+
+
+def write_parquet(records, path):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)")
+
+    schema = pa.schema([
+        ('session_id', pa.string()), ('conversation_id', pa.int64()), ('id', pa.int64()),
+        ('timestamp', pa.string()), ('speaker', pa.string()), ('message', pa.string()),
+        ('tool_calls', pa.string()),
+    ])
+    count = 0
+    with pq.ParquetWriter(path, schema, compression='zstd') as writer:
+        batch = []
+        for record in records:
+            record = dict(record)
+            record["tool_calls"] = json.dumps(record.get("tool_calls", []))
+            batch.append(record)
+            if len(batch) >= PARQUET_BATCH:
+                writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+                count += len(batch)
+                batch = []
+        if batch:
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+            count += len(batch)
+    return count
+
+
+def write_export(messages, path, fmt='jsonl', compress=False, header=None):
+    """Stream driver message rows to `path`; returns (rows, seconds).
+
+    Nothing is written when there are no rows, so an empty result never
+    creates or truncates `path`.
+    """
+    start = time.perf_counter()
+    messages = iter(messages)
+    first = next(messages, None)
+    if first is None:
+        return 0, time.perf_counter() - start
+    records = (export_record(msg) for msg in itertools.chain([first], messages))
+    if fmt == 'parquet':
+        count = write_parquet(records, path)
+    else:
+        with _open(path, compress) as f:
+            if fmt == 'json':
+                count = write_json(records, f, header or {})
+            elif fmt == 'csv':
+                count = write_csv(records, f)
+            else:
+                count = write_jsonl(records, f)
+    return count, time.perf_counter() - start
@@ -0,0 +1,28 @@
+"""
+Download the pinned livekit-client build into STATIC_DIR so the page loads it locally
+Usage: python -m utils.fetch_client_lib
+
+The page only switches to the local copy when CLIENT_PUBLIC_URL is set.
+"""
+
+import urllib.request
+
+from client_page import CLIENT_PUBLIC_URL, LIVEKIT_CLIENT_CDN, LIVEKIT_CLIENT_FILE
+from client_server import STATIC_DIR
+
+
+def main():
+    target = STATIC_DIR / LIVEKIT_CLIENT_FILE
+    STATIC_DIR.mkdir(parents=True, exist_ok=True)
+    with urllib.request.urlopen(LIVEKIT_CLIENT_CDN, timeout=30) as resp:
+        body = resp.read()
+    if b"LivekitClient" not in body:
+        raise SystemExit(f"Unexpected response from {LIVEKIT_CLIENT_CDN}")
+    target.write_bytes(body)
+    print(f"Saved {len(body) / 1024:.0f} KB to {target}")
+    if not CLIENT_PUBLIC_URL:
+        print("CLIENT_PUBLIC_URL is not set, so the page keeps loading the CDN build")
+
+
+if __name__ == "__main__":
+    main()
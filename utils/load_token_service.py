@@ -0,0 +1,138 @@
+"""
+Load-test the token service: tokens/sec and click-to-first-audio latency
+Usage: python -m utils.load_token_service [--url http://127.0.0.1:8088] [--clients C] [--seconds S]
+       python -m utils.load_token_service --first-audio 10
+
+The cached run asks for a named room, so it needs --secret (TOKEN_SERVICE_SECRET).
+
+--first-audio joins real rooms and needs a LiveKit server and a running agent.
+Each sample is taken once from the warm pool and once without it (pool=0).
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+import aiohttp
+from livekit import rtc
+
+from latency import percentile
+
+
+async def token_rate(url, clients, seconds, params, headers=None):
+    """Hammer GET /token from `clients` concurrent loops; returns (count, latencies_ms, errors)"""
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + seconds
+
+    async def client(http):
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                async with http.get(f"{url}/token", params=params, headers=headers) as resp:
+                    await resp.json()
+                    if resp.status != 200:
+                        errors += 1
+                        continue
+            except aiohttp.ClientError:
+                errors += 1
+                continue
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    connector = aiohttp.TCPConnector(limit=clients)
+    async with aiohttp.ClientSession(connector=connector) as http:
+        await asyncio.gather(*(client(http) for _ in range(clients)))
+    return len(latencies), latencies, errors
+
+
+async def first_audio(http, url, pooled, headers=None, timeout=30.0):
+    """(token_ms, first_audio_ms) from the click to the first non-silent agent audio frame"""
+    click = time.perf_counter()
+    async with http.get(f"{url}/token", params={"pool": "1" if pooled else "0"}, headers=headers) as resp:
+        data = await resp.json()
+    token_ms = (time.perf_counter() - click) * 1000
+
+    room = rtc.Room()
+    heard = asyncio.get_running_loop().create_future()
+
+    async def listen(track):
+        stream = rtc.AudioStream(track)
+        async for event in stream:
+            if any(event.frame.data):
+                if not heard.done():
+                    heard.set_result(time.perf_counter())
+                break
+        await stream.aclose()
+
+    @room.on("track_subscribed")
+    def on_track(track, publication, participant):
+        if track.kind == rtc.TrackKind.KIND_AUDIO:
+            asyncio.create_task(listen(track))
+
+    await room.connect(data["url"], data["token"])
+    try:
+        heard_at = await asyncio.wait_for(heard, timeout)
+    finally:
+        await room.disconnect()
+    return token_ms, (heard_at - click) * 1000
+
+
+async def bench_first_audio(url, samples, headers=None):
+    results = {"pooled": [], "cold": []}
+    async with aiohttp.ClientSession() as http:
+        for _ in range(samples):
+            for label, pooled in (("pooled", True), ("cold", False)):
+                try:
+                    results[label].append(await first_audio(http, url, pooled, headers))
+                except asyncio.TimeoutError:
+                    print(f"  {label}: no agent audio within the timeout")
+                # Let the pool refill between samples
+                await asyncio.sleep(2.0)
+
+    print(f"\n{'='*60}")
+    print(f"CLICK TO FIRST AUDIO - {samples} samples")
+    print(f"{'='*60}")
+    print(f"{'':10} {'token p50':>10} {'audio p50':>10} {'audio p95':>10}")
+    for label, rows in results.items():
+        if not rows:
+            continue
+        tokens = [r[0] for r in rows]
+        audio = [r[1] for r in rows]
+        print(f"{label:10} {percentile(tokens, 0.5):8.0f}ms {percentile(audio, 0.5):8.0f}ms "
+              f"{percentile(audio, 0.95):8.0f}ms")
+
+
+async def bench_tokens(url, clients, seconds, headers=None):
+    print(f"\n{'='*60}")
+    print(f"TOKENS - {clients} clients for {seconds:.0f}s")
+    print(f"{'='*60}")
+    # Same room/identity: served from the token cache. No room: fresh mint each time.
+    for label, params in (("cached", {"room": "load-test", "identity": "load-test"}),
+                          ("minted", {"pool": "0"})):
+        count, latencies, errors = await token_rate(url, clients, seconds, params, headers)
+        print(f"{label:8} {count / seconds:10.1f} tokens/s  p50 {percentile(latencies, 0.5):6.1f}ms  "
+              f"p99 {percentile(latencies, 0.99):6.1f}ms  errors {errors}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Token service load test")
+    parser.add_argument('--url', default="http://127.0.0.1:8088", help="Token service base URL")
+    parser.add_argument('--clients', '-c', type=int, default=50, help="Concurrent token clients")
+    parser.add_argument('--seconds', '-s', type=float, default=10.0, help="Duration of the token run")
+    parser.add_argument('--secret', default=os.getenv("TOKEN_SERVICE_SECRET", ""),
+                        help="Shared secret of the token service")
+    parser.add_argument('--first-audio', type=int, metavar='SAMPLES',
+                        help="Only measure click-to-first-audio against a live agent")
+    args = parser.parse_args()
+
+    headers = {"Authorization": f"Bearer {args.secret}"} if args.secret else None
+    if args.first_audio:
+        asyncio.run(bench_first_audio(args.url, args.first_audio, headers))
+    else:
+        asyncio.run(bench_tokens(args.url, args.clients, args.seconds, headers))
+
+
+if __name__ == "__main__":
+    main()
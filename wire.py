@@ -0,0 +1,126 @@
+# wire.py
+"""Compact binary framing for agent-to-browser data messages.
+
+Every binary packet starts with MAGIC, which can never begin a JSON text,
+so receivers tell the two formats apart by the first byte. A frame is
+``type byte, flags byte, body``; strings are varint length-prefixed UTF-8
+and long transcript text is zlib-compressed when that saves space.
+"""
+
+import json
+import struct
+import zlib
+
+MAGIC = 0xB1
+
+FRAME_JSON = 0
+FRAME_TRANSCRIPT = 1
+FRAME_COST = 2
+FRAME_BATCH = 3
+FRAME_PARTIAL = 4
+
+TEXT_FRAMES = {"transcript": FRAME_TRANSCRIPT, "partial": FRAME_PARTIAL}
+
+FLAG_DEFLATE = 0x01
+
+COMPRESS_MIN_BYTES = 256
+
+ENCODINGS = ("json", "binary")
+
+
+def _varint(n):
+    out = bytearray()
+    while True:
+        byte = n & 0x7F
+        n >>= 7
+        if n:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _read_varint(buf, pos):
+    result = shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+
+def _string(value):
+    data = value.encode()
+    return _varint(len(data)) + data
+
+
+def _read_string(buf, pos):
+    length, pos = _read_varint(buf, pos)
+    return bytes(buf[pos:pos + length]).decode(), pos + length
+
+
+def _encode_body(frame):
+    kind = frame.get("type")
+    if kind in TEXT_FRAMES and set(frame) <= {"type", "speaker", "text"}:
+        text = frame.get("text", "").encode()
+        flags = 0
+        if len(text) >= COMPRESS_MIN_BYTES:
+            compressed = zlib.compress(text)
+            if len(compressed) < len(text):
+                text, flags = compressed, FLAG_DEFLATE
+        return bytes([TEXT_FRAMES[kind], flags]) + _string(frame.get("speaker", "")) + _varint(len(text)) + text
+    if kind == "cost" and set(frame) <= {"type", "total", "audio_input_seconds", "audio_output_seconds", "text_tokens"}:
+        return bytes([FRAME_COST, 0]) + struct.pack(
+            "<dff", frame.get("total", 0.0),
+            frame.get("audio_input_seconds", 0.0), frame.get("audio_output_seconds", 0.0),
+        ) + _varint(int(frame.get("text_tokens", 0)))
+    if kind == "batch":
+        parts = [_encode_body(f) for f in frame["frames"]]
+        return bytes([FRAME_BATCH, 0]) + _varint(len(parts)) + b"".join(_varint(len(p)) + p for p in parts)
+    return bytes([FRAME_JSON, 0]) + _string(json.dumps(frame, separators=(",", ":")))
+
+
+def encode(frame, encoding="binary"):
+    """Encode one frame dict for the data channel"""
+    if encoding == "json":
+        return json.dumps(frame).encode()
+    return bytes([MAGIC]) + _encode_body(frame)
+
+
+def _decode_body(buf, pos):
+    kind, flags = buf[pos], buf[pos + 1]
+    pos += 2
+    if kind in (FRAME_TRANSCRIPT, FRAME_PARTIAL):
+        speaker, pos = _read_string(buf, pos)
+        length, pos = _read_varint(buf, pos)
+        text = bytes(buf[pos:pos + length])
+        if flags & FLAG_DEFLATE:
+            text = zlib.decompress(text)
+        name = "transcript" if kind == FRAME_TRANSCRIPT else "partial"
+        return {"type": name, "speaker": speaker, "text": text.decode()}
+    if kind == FRAME_COST:
+        total, audio_in, audio_out = struct.unpack_from("<dff", buf, pos)
+        tokens, _ = _read_varint(buf, pos + 16)
+        return {"type": "cost", "total": total, "audio_input_seconds": round(audio_in, 1),
+                "audio_output_seconds": round(audio_out, 1), "text_tokens": tokens}
+    if kind == FRAME_BATCH:
+        count, pos = _read_varint(buf, pos)
+        frames = []
+        for _ in range(count):
+            length, pos = _read_varint(buf, pos)
+            frames.append(_decode_body(buf, pos))
+            pos += length
+        return {"type": "batch", "frames": frames}
+    if kind == FRAME_JSON:
+        text, _ = _read_string(buf, pos)
+        return json.loads(text)
+    raise ValueError(f"unknown frame type {kind}")
+
+
+def decode(payload):
+    """Decode a data-channel payload in either encoding"""
+    if payload and payload[0] == MAGIC:
+        return _decode_body(payload, 1)
+    return json.loads(payload)